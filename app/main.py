@@ -1,25 +1,72 @@
 import asyncio
-import json
+import math
+import re
+import time
 from functools import wraps
+import asyncssh
 import disnake
 from disnake.ext import commands
 
+from utils.config import config
 from utils.time import Time
+from utils.log import logger
 from utils.responses import Response
 from utils.steam import SteamAPI
-from utils.file_operations import FileOperations as Operation
-from utils.file_manager import FileManager as File
-
-
-with open("config.json", "r") as config_file:
-    config = json.load(config_file)
-
-bot = commands.InteractionBot(intents=None)
+from utils.bulk_changes import BulkChanges
+from utils.replication import Replication
+from utils.sync import FileSync, file_sync
+from utils.user_index import user_index
+from utils.warmup import WarmUp
+from utils.autocomplete import Autocomplete, MAX_SUGGESTIONS
+from utils.metrics import Metrics, current_command
+from utils.audit import AuditJournal, LISTED, current_actor, journal
+from utils.discord_cache import DiscordCache
+from utils.file_manager import FileManager as File, FileConflictError
+
+
+# A page of names and profile links stays under the 4096 embed limit
+USERS_PER_PAGE = 25
+# Diff lines shown per target server by /синхронізувати-сервери
+DIFF_PREVIEW_LINES = 20
+SERVER_CHOICES = list(config["servers"])
+
+
+class Bot(commands.InteractionBot):
+    async def close(self) -> None:
+        """Stops the background work and flushes the audit journal on shutdown."""
+        await super().close()
+        if warm_up_task is not None:
+            warm_up_task.cancel()
+        if file_sync:
+            await file_sync.stop()
+        if journal:
+            await journal.close()
+        await File.close()
+        await SteamAPI.close()
+
+
+bot = Bot(intents=None)
+File.listeners.append(user_index.update)
+if journal:
+    File.listeners.append(journal.record)
+warm_up_task = None
+metrics_config = config.get("metrics", {})
+# perf_counter at the start of every running command, by interaction id
+command_started: dict[int, float] = {}
 
 
 @bot.event
 async def on_ready():
-    print(f"[{await Time.get_normalised()}] Виконано вхід як {bot.user}")
+    logger.info(f"Виконано вхід як {bot.user}")
+    global warm_up_task
+    if warm_up_task is None and config.get("warm_up", True):
+        warm_up_task = asyncio.create_task(WarmUp.run(SERVER_CHOICES))
+    if file_sync:
+        file_sync.start()
+    if metrics_config.get("enabled", True):
+        await Metrics.start_server(
+            metrics_config.get("host", "127.0.0.1"), metrics_config.get("port", 9108)
+        )
     await asyncio.sleep(1)
     await bot.change_presence(
         activity=disnake.Activity(
@@ -32,21 +79,78 @@ async def on_ready():
 async def on_slash_command(inter):
     user = inter.author
     command = inter.data.name
-    print(
-        f"[{await Time.get_normalised()}] "
-        f"Користувач {user} використав команду /{command}"
+    logger.info(
+        f"Користувач {user} використав команду /{command}",
+        extra={"command": command, "user": str(user)}
+    )
+
+
+@bot.event
+async def on_guild_channel_update(before, after):
+    DiscordCache.invalidate_channel(after.id)
+
+
+@bot.event
+async def on_guild_channel_delete(channel):
+    DiscordCache.invalidate_channel(channel.id)
+
+
+@bot.event
+async def on_guild_role_create(role):
+    DiscordCache.invalidate_roles(role.guild.id)
+
+
+@bot.event
+async def on_guild_role_update(before, after):
+    DiscordCache.invalidate_roles(after.guild.id)
+
+
+@bot.event
+async def on_guild_role_delete(role):
+    DiscordCache.invalidate_roles(role.guild.id)
+
+
+@bot.before_slash_command_invoke
+async def before_slash_command(inter):
+    current_command.set(inter.data.name)
+    current_actor.set((inter.author.id, str(inter.author)))
+    command_started[inter.id] = time.perf_counter()
+
+
+@bot.after_slash_command_invoke
+async def after_slash_command(inter):
+    started = command_started.pop(inter.id, None)
+    latency = time.perf_counter() - started if started is not None else None
+    outcome = "error" if inter.command_failed else "ok"
+    if latency is not None:
+        Metrics.observe("command", latency)
+    Metrics.increment("commands_total", outcome=outcome)
+    logger.info(
+        f"Команда /{inter.data.name} виконана за {latency or 0:.3f} с",
+        extra={
+            "command": inter.data.name,
+            "user": str(inter.author),
+            "server": inter.filled_options.get("server"),
+            "latency": latency,
+            "outcome": outcome,
+        }
     )
 
 
 @bot.event
 async def on_slash_command_error(inter, error):
-    if isinstance(error, commands.MissingAnyRole):
-        allowed_roles = [
-            role.mention
-            for role_id in config.get("allowed_roles", [])
-            if (role := inter.guild.get_role(role_id))
-        ]
+    if isinstance(error, commands.CheckFailure):
+        current_command.set(inter.data.name)
+        Metrics.increment("commands_total", outcome="rejected")
+        if not DiscordCache.may_reject(inter):
+            return
 
+    if isinstance(error, commands.MissingPermissions):
+        await Response.send_ephemeral(
+            inter, "Ця команда доступна лише адміністраторам"
+        )
+    elif isinstance(error, commands.MissingAnyRole):
+        allowed_roles = DiscordCache.allowed_role_mentions(inter.guild)
         if allowed_roles:
             roles_list = ", ".join(allowed_roles)
             await Response.send_ephemeral(
@@ -59,8 +163,66 @@ async def on_slash_command_error(inter, error):
                 inter,
                 "На сервері немає ролей, яким дозволено використання бота"
             )
+    elif isinstance(error, commands.CommandInvokeError) and isinstance(
+            error.original, FileConflictError
+    ):
+        server = inter.filled_options.get("server")
+        logger.warning(
+            f"Файл на сервері {server} змінювався одночасно: {error.original}",
+            extra={"command": inter.data.name, "server": server, "error": repr(error.original)}
+        )
+        await Response.send_ephemeral(
+            inter,
+            f"Файл на сервері {server or ''} було змінено одночасно з вами, "
+            "спробуйте ще раз"
+        )
+    elif isinstance(error, commands.CommandInvokeError) and isinstance(
+            error.original, (asyncssh.Error, OSError, asyncio.TimeoutError)
+    ):
+        server = inter.filled_options.get("server")
+        logger.warning(
+            f"Сервер {server} недоступний: {error.original!r}",
+            extra={"command": inter.data.name, "server": server, "error": repr(error.original)}
+        )
+        await Response.send_ephemeral(
+            inter, f"Сервер {server or ''} недоступний, спробуйте пізніше"
+        )
     else:
-        print("Виникла непередбачувана помилка: ", error)
+        logger.error(
+            "Виникла непередбачувана помилка",
+            exc_info=error,
+            extra={"command": inter.data.name, "user": str(inter.author), "error": repr(error)}
+        )
+
+
+def format_diff(diff) -> str:
+    if not diff:
+        return ""
+    return "```diff\n" + "\n".join(diff) + "\n```"
+
+
+def log_diff(server, choose, diff) -> None:
+    logger.info(
+        f"{server}, {config[choose]}:\n" + "\n".join(diff),
+        extra={"command": current_command.get(), "server": server}
+    )
+
+
+def format_change(change) -> str:
+    if change.file == "ra_file":
+        return f"роль ``{change.old_value or '—'}`` → ``{change.new_value or '—'}``"
+    list_name = "білого списку" if change.file == "whitelist_file" else "виділених слотів"
+    if change.new_value == LISTED:
+        return f"доданий до {list_name}"
+    return f"видалений з {list_name}"
+
+
+def format_age(server, chooses) -> str:
+    age = File.age(server, chooses)
+    text = "" if age is None else f"*Дані оновлено {int(age)} с тому*\n"
+    if not File.is_available(server):
+        text += "*⚠️ Сервер недоступний, показано збережені дані*\n"
+    return text
 
 
 def check_channel():
@@ -74,7 +236,9 @@ def check_channel():
         async def wrapper(interaction, *args, **kwargs):
             allowed_channel_id = config["perms_channel_id"]
             if interaction.channel_id != allowed_channel_id:
-                channel = await bot.fetch_channel(allowed_channel_id)
+                if not DiscordCache.may_reject(interaction):
+                    return
+                channel = await DiscordCache.channel(bot, allowed_channel_id)
                 message = (
                     "Цю команду не можна використовувати в цьому каналі\n"
                     f"Використовуйте канал {channel.mention}"
@@ -139,20 +303,31 @@ async def grant_role(
         steamid: str = commands.Param(description="Введіть стім-айді людини"),
         role: str = commands.Param(description="Введіть роль"),
         server: str = commands.Param(
-            choices=list(config["servers"].keys()), description="Оберіть сервер"
+            choices=SERVER_CHOICES, description="Оберіть сервер"
         ),
 ):
     await interaction.response.defer()
+
+    cached_ra_config = File.cached(server, "ra_file")
+    if cached_ra_config and not cached_ra_config.contains_role(role):
+        await server_roles(interaction=interaction, server=server)
+        return
+
     profile_link = await SteamAPI.get_steam_profile_link(steamid)
     profile_name, profile_avatar = await SteamAPI.get_profile_name_and_avatar(steamid)
 
-    await File.get(server, "ra_file")
+    def edit(ra_config):
+        old_role = ra_config.get_role(steamid)
+        role_exists = ra_config.contains_role(role)
+        if role_exists and old_role != role:
+            ra_config.set_role(steamid, role)
+        return role_exists, old_role, ra_config.diff()
 
-    server_config = config["servers"][server]
-    local_file_path = server_config["port"] + "-" + config["ra_file"]
-    old_role = await Operation.get_role(steamid, local_file_path)
+    role_exists, old_role, diff = await File.modify(server, "ra_file", edit)
+    if diff:
+        log_diff(server, "ra_file", diff)
 
-    if not await Operation.contains_role(role, local_file_path):
+    if not role_exists:
         await server_roles(interaction=interaction, server=server)
         return
 
@@ -160,30 +335,35 @@ async def grant_role(
         await Response.send_silent(interaction, "Користувач вже має вказану роль")
         return
     elif old_role:
-        await Operation.change_role(local_file_path, steamid, old_role, role)
-
         text = f"## [``{profile_name}``]({profile_link})\n"
         text += (
             f"### {server}\n Роль **``{role}``** була додана користувачу\n "
             f"Вона замінила стару роль **``{old_role}``**\n "
         )
+        text += format_diff(diff)
 
         await Response.send(interaction, text, 0x36BE25, profile_avatar, True)
-
-        await File.put(server, "ra_file")
         return
     else:
-        await Operation.add_role(local_file_path, steamid, role)
-
         text = f"## [``{profile_name}``]({profile_link})\n"
         text += f"### {server}\n Роль **``{role}``** була додана користувачу\n "
+        text += format_diff(diff)
 
         await Response.send(interaction, text, 0x36BE25, profile_avatar, True)
-
-        await File.put(server, "ra_file")
         return
 
 
+@grant_role.autocomplete("role")
+async def role_autocomplete(interaction: disnake.ApplicationCommandInteraction, string: str):
+    server = interaction.filled_options.get("server")
+    suggestions = {}
+    for candidate in [server] if server in config["servers"] else SERVER_CHOICES:
+        suggestions.update(Autocomplete.roles(
+            candidate, string, config["prohibited_roles_names"]
+        ))
+    return dict(list(suggestions.items())[:MAX_SUGGESTIONS])
+
+
 @bot.slash_command(name="забрати-роль", description="Забрати роль на сервері")
 @commands.has_any_role(*config["allowed_roles"])
 @check_channel()
@@ -192,38 +372,73 @@ async def remove_role(
         interaction: disnake.ApplicationCommandInteraction,
         steamid: str = commands.Param(description="Введіть стім-айді людини"),
         server: str = commands.Param(
-            choices=list(config["servers"].keys()), description="Оберіть сервер"
+            choices=SERVER_CHOICES, description="Оберіть сервер"
         ),
 ):
     await interaction.response.defer()
     profile_link = await SteamAPI.get_steam_profile_link(steamid)
     profile_name, profile_avatar = await SteamAPI.get_profile_name_and_avatar(steamid)
 
-    await File.get(server, "ra_file")
+    def edit(ra_config):
+        old_role = ra_config.get_role(steamid)
+        ra_config.remove_member(steamid)
+        return old_role, ra_config.diff()
 
-    server_config = config["servers"][server]
-    local_file_path = server_config["port"] + "-" + config["ra_file"]
-    old_role = await Operation.get_role(steamid, local_file_path)
+    old_role, diff = await File.modify(server, "ra_file", edit)
+    if diff:
+        log_diff(server, "ra_file", diff)
 
     if not old_role:
         await Response.send_silent(interaction, "У користувача немає ролі на сервері")
         return
     else:
-        await Operation.remove_role(local_file_path, steamid, old_role)
-
         text = f"## [``{profile_name}``]({profile_link})\n"
         text += f"### {server}\n Роль **``{old_role}``** була знята з користувача\n "
+        text += format_diff(diff)
 
         await Response.send(interaction, text, 0xBE2536, profile_avatar, True)
-
-        await File.put(server, "ra_file")
         return
 
 
+@remove_role.autocomplete("steamid")
+async def member_autocomplete(interaction: disnake.ApplicationCommandInteraction, string: str):
+    server = interaction.filled_options.get("server")
+    if server not in config["servers"]:
+        return {}
+    return Autocomplete.members(server, re.sub(r"\D", "", string))
+
+
 async def update_server_data(server):
-    await File.get(server, "ra_file")
-    await File.get(server, "reserved_slots_file")
-    await File.get(server, "whitelist_file")
+    return await File.load_many(
+        server,
+        ["ra_file", "whitelist_file", "reserved_slots_file"],
+        File.read_staleness(),
+        stale_on_error=True
+    )
+
+
+async def fetch_servers_data(servers, load=update_server_data) -> dict:
+    """
+    Runs load(server), all files of the server by default, for all servers
+    concurrently, at most File.max_concurrent_servers at a time. A server
+    that fails, or does not answer within the server_health timeouts
+    and has nothing cached, is mapped to None.
+    """
+    semaphore = asyncio.Semaphore(File.max_concurrent_servers)
+
+    async def fetch(server):
+        async with semaphore:
+            try:
+                return await load(server)
+            except (asyncio.TimeoutError, asyncssh.Error, OSError) as error:
+                logger.warning(
+                    f"Сервер {server} недоступний: {error!r}",
+                    extra={"server": server, "error": repr(error)}
+                )
+                return None
+
+    results = await asyncio.gather(*(fetch(server) for server in servers))
+    return dict(zip(servers, results))
 
 
 @bot.slash_command(name="показати-користувача", description="Детальна інформація про користувача")
@@ -238,33 +453,39 @@ async def show_user(
     await interaction.response.send_message(embed=response, ephemeral=True)
 
     profile_link = await SteamAPI.get_steam_profile_link(steamid)
-    profile_name, profile_avatar = await SteamAPI.get_profile_name_and_avatar(steamid)
+    profiles, servers_data = await asyncio.gather(
+        SteamAPI.get_profiles([steamid]),
+        fetch_servers_data(SERVER_CHOICES)
+    )
+    profile_name, profile_avatar = profiles[steamid]
+    user_state = user_index.get(steamid)
 
     text = f"## [``{profile_name}``]({profile_link})\n"
 
-    for server in config["servers"]:
-        await update_server_data(server)
-        server_config = config["servers"][server]
-        local_file_path = server_config["port"] + "-" + config["ra_file"]
-        role = await Operation.get_role(steamid, local_file_path)
+    for server, server_data in servers_data.items():
+        if server_data is None:
+            text += f"### {server}\n Сервер недоступний ⚠️\n"
+            continue
+
+        state = user_state.get(server, {})
+        role = state.get("role")
 
         if role:
             text += f"### {server}\n Роль: **``{role}``** \n"
         else:
             text += f"### {server}\n Роль: **``немає``** \n"
 
-        local_file_path = server_config["port"] + "-" + config["whitelist_file"]
-        if await Operation.in_miscellaneous(local_file_path, steamid):
+        if state.get("whitelist"):
             text += "Білий список: ✅ "
         else:
             text += "Білий список: ❌ "
 
-        local_file_path = server_config["port"] + "-" + config["reserved_slots_file"]
-        if await Operation.in_miscellaneous(local_file_path, steamid):
+        if state.get("reserved_slots"):
             text += "Виділені слоти: ✅\n"
         else:
             text += "Виділені слоти: ❌\n"
 
+        text += format_age(server, FileSync.files)
 
     await Response.edit(interaction, text, profile_avatar)
 
@@ -275,7 +496,7 @@ async def show_user(
 async def show_users(
         interaction: disnake.ApplicationCommandInteraction,
         server: str = commands.Param(
-            choices=list(config["servers"].keys()), description="Оберіть сервер"
+            choices=SERVER_CHOICES, description="Оберіть сервер"
         ),
         miscellaneous: str = commands.Param(
             choices=[
@@ -289,69 +510,50 @@ async def show_users(
     await Response.send_ephemeral(interaction, "Очікуйте...")
 
     text = f"## Користувачі {server} "
-    users = []
 
-    server_config = config["servers"][server]
     if not miscellaneous:
-        await File.get(server, "ra_file")
         text += "\n(Адмін-права)\n"
-        ra_file_path = server_config["port"] + "-" + config["ra_file"]
-
-        count = 0
-        data = await Operation.get_users(ra_file_path)
-
-        for steamid64, user_role in data.items():
-            profile_link = await SteamAPI.get_steam_profile_link(steamid64)
-            profile_name = await SteamAPI.get_steam_profile_name(steamid64)
-            count += 1
-            user_data = (
-                f"{count}. [``{profile_name}``]({profile_link}) – **{user_role}**"
-            )
-            users.append(user_data + "\n")
+        ra_config = await File.load(
+            server, "ra_file", File.read_staleness(), stale_on_error=True
+        )
+        text += format_age(server, ["ra_file"])
+        users = list(ra_config.members.items())
     else:
         if miscellaneous == "whitelist":
-            await File.get(server, "whitelist_file")
             text += "\n(Білий список)\n"
-            miscellaneous_file_path = (
-                    server_config["port"] + "-" + config["whitelist_file"]
-            )
+            choose = "whitelist_file"
         else:
-            await File.get(server, "reserved_slots_file")
             text += "\n(Виділені слоти)\n"
-            miscellaneous_file_path = (
-                    server_config["port"] + "-" + config["reserved_slots_file"]
-            )
+            choose = "reserved_slots_file"
 
-        ids = await File.read(miscellaneous_file_path)
-        for count, steamid64 in enumerate(set(ids.split("\n"))):
-            if steamid64.startswith("#") or len(steamid64) < 17:
-                continue
-            profile_link = await SteamAPI.get_steam_profile_link(steamid64)
-            profile_name = await SteamAPI.get_steam_profile_name(steamid64)
-            user_data = f"{count}. [``{profile_name}``]({profile_link})"
-            users.append(user_data + "\n")
+        user_list = await File.load(
+            server, choose, File.read_staleness(), stale_on_error=True
+        )
+        text += format_age(server, [choose])
+        users = [(steamid64, None) for steamid64 in user_list.steamids()]
 
     if not users:
         await Response.edit(interaction, "Користувачі з доступом відсутні")
         return
 
-    united = text + "".join(users)
-    if len(united) < 4000:
-        await Response.edit(interaction, united)
-    else:
-        for user in users:
-            segment = text + user
-            if len(segment) < 4000:
-                text += user
-            else:
-                if text:
-                    await Response.edit(interaction, text)
-                    text = user
-                else:
-                    await Response.send_ephemeral(interaction, text)
-                    text = user
-        if text != "":
-            await Response.send_ephemeral(interaction, text)
+    async def render(index):
+        start = index * USERS_PER_PAGE
+        page_users = users[start:start + USERS_PER_PAGE]
+        profiles = await SteamAPI.get_profiles(
+            steamid64 for steamid64, _ in page_users
+        )
+
+        page = text
+        for count, (steamid64, user_role) in enumerate(page_users, start=start + 1):
+            profile_link = await SteamAPI.get_steam_profile_link(steamid64)
+            profile_name, _ = profiles[steamid64]
+            page += f"{count}. [``{profile_name}``]({profile_link})"
+            page += f" – **{user_role}**\n" if user_role else "\n"
+        return page
+
+    await Response.edit_paginated(
+        interaction, render, math.ceil(len(users) / USERS_PER_PAGE)
+    )
 
 
 @bot.slash_command(name="ролі-серверу", description="Показати ролі серверу")
@@ -360,7 +562,7 @@ async def show_users(
 async def server_roles(
         interaction: disnake.ApplicationCommandInteraction,
         server: str = commands.Param(
-            choices=list(config["servers"].keys()), description="Оберіть сервер"
+            choices=SERVER_CHOICES, description="Оберіть сервер"
         ),
 ):
     if "ролі-серверу" != interaction.data["name"]:
@@ -370,17 +572,72 @@ async def server_roles(
         text = ""
         await Response.send_ephemeral(interaction, "Очікуйте...")
 
-    await File.get(server, "ra_file")
-    server_config = config["servers"][server]
-    local_file_path = server_config["port"] + "-" + config["ra_file"]
+    ra_config = await File.load(
+        server, "ra_file", File.read_staleness(), stale_on_error=True
+    )
     text += (
         f"### Ролі серверу {server}:\n "
-        f"{await Operation.get_roles(local_file_path)}"
+        f"{ra_config.format_roles()}\n"
     )
+    text += format_age(server, ["ra_file"])
 
     await Response.edit(interaction, text)
 
 
+@bot.slash_command(name="пошук-доступів", description="Пошук користувачів на всіх серверах")
+@commands.has_any_role(*config["allowed_roles"])
+@check_channel()
+async def search_access(
+        interaction: disnake.ApplicationCommandInteraction,
+        query: str = commands.Param(
+            choices=[
+                disnake.OptionChoice(name="Користувачі з роллю", value="role"),
+                disnake.OptionChoice(name="Білий список без ролі", value="whitelist_only"),
+            ],
+            description="Кого шукати?",
+        ),
+        role: str = commands.Param(
+            description="Роль (для пошуку користувачів з роллю)", default=None
+        ),
+):
+    if query == "role" and not role:
+        await Response.send_ephemeral(interaction, "Вкажіть роль для пошуку")
+        return
+
+    await Response.send_ephemeral(interaction, "Очікуйте...")
+
+    servers_data = await fetch_servers_data(SERVER_CHOICES)
+    if query == "role":
+        header = f"## Користувачі з роллю ``{role}``\n"
+        found = user_index.with_role(role)
+    else:
+        header = "## Користувачі з білого списку без ролі\n"
+        found = user_index.whitelisted_without_role()
+
+    profiles = await SteamAPI.get_profiles(
+        steamid for steamids in found.values() for steamid in steamids
+    )
+
+    lines = []
+    for server, server_data in servers_data.items():
+        if server_data is None:
+            lines.append(f"### {server}\n Сервер недоступний ⚠️\n")
+            continue
+        if not found.get(server):
+            continue
+        lines.append(f"### {server}\n")
+        for count, steamid64 in enumerate(found[server], start=1):
+            profile_link = await SteamAPI.get_steam_profile_link(steamid64)
+            profile_name, _ = profiles[steamid64]
+            lines.append(f"{count}. [``{profile_name}``]({profile_link})\n")
+
+    if not lines:
+        await Response.edit(interaction, "Користувачів не знайдено")
+        return
+
+    await Response.edit_pages(interaction, header, lines)
+
+
 @bot.slash_command(name="білий-список", description="Керування білим списком")
 @commands.has_any_role(*config["allowed_roles"])
 @check_channel()
@@ -396,47 +653,42 @@ async def white_list(
             description="Оберіть дію",
         ),
         server: str = commands.Param(
-            choices=list(config["servers"].keys()), description="Оберіть сервер"
+            choices=SERVER_CHOICES, description="Оберіть сервер"
         ),
 ):
     await interaction.response.defer()
     profile_link = await SteamAPI.get_steam_profile_link(steamid)
     profile_name, profile_avatar = await SteamAPI.get_profile_name_and_avatar(steamid)
 
-    await File.get(server, "whitelist_file")
-
-    server_config = config["servers"][server]
-    local_file_path = server_config["port"] + "-" + config["whitelist_file"]
-
     if action == "додати":
-        if await Operation.in_miscellaneous(local_file_path, steamid):
+        added = await File.modify(
+            server, "whitelist_file", lambda user_list: user_list.add(steamid)
+        )
+        if not added:
             await Response.send_silent(
                 interaction, "Користувач вже доданий до білого списку серверу"
             )
             return
         else:
-            await Operation.add_miscellaneous(local_file_path, steamid)
             text = f"## [``{profile_name}``]({profile_link})\n"
             text += f"### {server}\n Користувач доданий до білого списку серверу\n "
 
             await Response.send(interaction, text, 0x36BE25, profile_avatar, True)
-
-            await File.put(server, "whitelist_file")
             return
     elif action == "видалити":
-        if not await Operation.in_miscellaneous(local_file_path, steamid):
+        removed = await File.modify(
+            server, "whitelist_file", lambda user_list: user_list.remove(steamid)
+        )
+        if not removed:
             await Response.send_silent(
                 interaction, "Користувача немає у білому списку серверу"
             )
             return
         else:
-            await Operation.remove_miscellaneous(local_file_path, steamid)
             text = f"## [``{profile_name}``]({profile_link})\n"
             text += f"### {server}\n Користувач видалений з білого списку серверу\n "
 
             await Response.send(interaction, text, 0xBE2536, profile_avatar, True)
-
-            await File.put(server, "whitelist_file")
             return
 
 
@@ -455,43 +707,357 @@ async def reserved_slots(
             description="Оберіть дію",
         ),
         server: str = commands.Param(
-            choices=list(config["servers"].keys()), description="Оберіть сервер"
+            choices=SERVER_CHOICES, description="Оберіть сервер"
         ),
 ):
     await interaction.response.defer()
     profile_link = await SteamAPI.get_steam_profile_link(steamid)
     profile_name, profile_avatar = await SteamAPI.get_profile_name_and_avatar(steamid)
 
-    await File.get(server, "reserved_slots_file")
-
-    server_config = config["servers"][server]
-    local_file_path = server_config["port"] + "-" + config["reserved_slots_file"]
-
     if action == "додати":
-        if await Operation.in_miscellaneous(local_file_path, steamid):
+        added = await File.modify(
+            server, "reserved_slots_file", lambda user_list: user_list.add(steamid)
+        )
+        if not added:
             await Response.send_silent(interaction, "Користувач вже має виділений слот")
             return
         else:
-            await Operation.add_miscellaneous(local_file_path, steamid)
             text = f"## [``{profile_name}``]({profile_link})\n"
             text += f"### {server}\n Користувачу доданий виділений слот\n "
 
             await Response.send(interaction, text, 0x36BE25, profile_avatar, True)
-
-            await File.put(server, "reserved_slots_file")
             return
     elif action == "видалити":
-        if not await Operation.in_miscellaneous(local_file_path, steamid):
+        removed = await File.modify(
+            server, "reserved_slots_file", lambda user_list: user_list.remove(steamid)
+        )
+        if not removed:
             await Response.send_silent(interaction, "Користувач не має виділеного слоту")
             return
         else:
-            await Operation.remove_miscellaneous(local_file_path, steamid)
             text = f"## [``{profile_name}``]({profile_link})\n"
             text += f"### {server}\n Користувачу видалений виділений слот\n "
             await Response.send(interaction, text, 0xBE2536, profile_avatar, True)
+            return
+
+
+@bot.slash_command(name="масові-зміни", description="Застосувати багато змін доступу за раз")
+@commands.has_any_role(*config["allowed_roles"])
+@check_channel()
+async def bulk_changes(
+        interaction: disnake.ApplicationCommandInteraction,
+        entries: str = commands.Param(
+            description="Зміни через ; (напр. 7656... видати-роль admin; 7656... білий-список додати)",
+            default=None,
+        ),
+        file: disnake.Attachment = commands.Param(
+            description="Текстовий файл зі змінами, по одній на рядок",
+            default=None,
+        ),
+        servers: str = commands.Param(
+            description="Назви серверів через кому (усі сервери, якщо не вказано)",
+            default=None,
+        ),
+):
+    await Response.send_ephemeral(interaction, "Очікуйте...")
+
+    text = entries or ""
+    if file:
+        text += "\n" + (await file.read()).decode("utf-8", errors="replace")
+
+    if servers:
+        targets = [server.strip() for server in servers.split(",") if server.strip()]
+        unknown = [server for server in targets if server not in config["servers"]]
+        if unknown:
+            await Response.edit(
+                interaction, f"Невідомі сервери: {', '.join(unknown)}"
+            )
+            return
+    else:
+        targets = SERVER_CHOICES
+
+    parsed_entries, errors = BulkChanges.parse(text, config["prohibited_roles_names"])
+    if not parsed_entries and not errors:
+        await Response.edit(interaction, "Не вказано жодної зміни")
+        return
+
+    by_file = {}
+    for entry in parsed_entries:
+        by_file.setdefault(entry.file, []).append(entry)
+
+    semaphore = asyncio.Semaphore(File.max_concurrent_servers)
+
+    async def apply_to_server(server):
+        async with semaphore:
+            results = {}
+            for choose, file_entries in by_file.items():
+                def edit(model, entries=file_entries):
+                    outcomes = BulkChanges.apply(model, entries)
+                    return outcomes, model.diff() if choose == "ra_file" else []
+
+                try:
+                    outcomes, diff = await File.modify(server, choose, edit)
+                except (asyncssh.Error, OSError, asyncio.TimeoutError, FileConflictError) as error:
+                    outcomes = [f"помилка сервера ({error!r})"] * len(file_entries)
+                    diff = []
+                if diff:
+                    log_diff(server, choose, diff)
+                results.update(zip(file_entries, outcomes))
+            return results
+
+    profiles, servers_results = await asyncio.gather(
+        SteamAPI.get_profiles(entry.steamid for entry in parsed_entries),
+        asyncio.gather(*(apply_to_server(server) for server in targets))
+    )
+
+    lines = [f"❌ {error}\n" for error in errors]
+    for server, results in zip(targets, servers_results):
+        lines.append(f"### {server}\n")
+        for entry in parsed_entries:
+            profile_name, _ = profiles[entry.steamid]
+            profile_link = await SteamAPI.get_steam_profile_link(entry.steamid)
+            lines.append(
+                f"[``{profile_name}``]({profile_link}) – {entry.command}: "
+                f"{results[entry]}\n"
+            )
+
+    await Response.edit_pages(interaction, "## Результати масових змін\n", lines)
+
+
+@bot.slash_command(name="синхронізувати-сервери", description="Скопіювати доступи одного серверу на інші")
+@commands.has_any_role(*config["allowed_roles"])
+@check_channel()
+async def replicate(
+        interaction: disnake.ApplicationCommandInteraction,
+        source: str = commands.Param(
+            choices=SERVER_CHOICES, description="Сервер, з якого копіювати"
+        ),
+        choose: str = commands.Param(
+            name="файл",
+            choices=[
+                disnake.OptionChoice(name="Адмін-права", value="ra_file"),
+                disnake.OptionChoice(name="Білий список", value="whitelist_file"),
+                disnake.OptionChoice(name="Виділені слоти", value="reserved_slots_file"),
+            ],
+            description="Що синхронізувати?",
+        ),
+        servers: str = commands.Param(
+            description="Назви серверів через кому (усі інші сервери, якщо не вказано)",
+            default=None,
+        ),
+        dry_run: bool = commands.Param(
+            name="лише-показати",
+            description="Лише показати зміни, нічого не завантажуючи",
+            default=True,
+        ),
+):
+    await Response.send_ephemeral(interaction, "Очікуйте...")
+
+    if servers:
+        targets = [server.strip() for server in servers.split(",") if server.strip()]
+        unknown = [server for server in targets if server not in config["servers"]]
+        if unknown:
+            await Response.edit(
+                interaction, f"Невідомі сервери: {', '.join(unknown)}"
+            )
+            return
+    else:
+        targets = SERVER_CHOICES
+    targets = [server for server in targets if server != source]
+    if not targets:
+        await Response.edit(interaction, "Не вказано жодного іншого серверу")
+        return
+
+    try:
+        source_model = await File.load(source, choose)
+    except (asyncssh.Error, OSError, asyncio.TimeoutError) as error:
+        await Response.edit(interaction, f"Сервер {source} недоступний ({error!r})")
+        return
+    prohibited_roles = config["prohibited_roles_names"]
+
+    if dry_run:
+        target_models = await fetch_servers_data(
+            targets,
+            lambda server: File.load(
+                server, choose, File.read_staleness(), stale_on_error=True
+            )
+        )
 
-            await File.put(server, "reserved_slots_file")
+        def preview(server):
+            if target_models[server] is None:
+                return None
+            return Replication.preview(source_model, target_models[server], prohibited_roles)
+
+        results = [preview(server) for server in targets]
+    else:
+        semaphore = asyncio.Semaphore(File.max_concurrent_servers)
+
+        def edit(model):
+            changes, skipped = Replication.plan(source_model, model, prohibited_roles)
+            return model.apply(changes), skipped
+
+        async def apply_to_server(server):
+            async with semaphore:
+                try:
+                    return await File.modify(server, choose, edit)
+                except (asyncssh.Error, OSError, asyncio.TimeoutError, FileConflictError) as error:
+                    logger.warning(
+                        f"Сервер {server} недоступний: {error!r}",
+                        extra={"server": server, "error": repr(error)}
+                    )
+                    return None
+
+        results = await asyncio.gather(*(apply_to_server(server) for server in targets))
+
+    lines = []
+    for server, result in zip(targets, results):
+        lines.append(f"### {server}\n")
+        if result is None:
+            lines.append(" Сервер недоступний ⚠️\n")
+            continue
+        diff, skipped = result
+        if not diff:
+            lines.append(" Вже синхронізовано\n")
+        else:
+            if not dry_run:
+                log_diff(server, choose, diff)
+            lines.append(f" Змінених рядків: {len(diff)}\n")
+            lines.extend(f"``{line}``\n" for line in diff[:DIFF_PREVIEW_LINES])
+            if len(diff) > DIFF_PREVIEW_LINES:
+                lines.append(f"… і ще {len(diff) - DIFF_PREVIEW_LINES}\n")
+        if skipped:
+            lines.append(
+                f" Пропущено (роль відсутня на сервері або заборонена): {len(skipped)}\n"
+            )
+
+    header = f"## {'Попередній перегляд синхронізації' if dry_run else 'Синхронізація'} з {source}\n"
+    await Response.edit_pages(interaction, header, lines)
+
+
+@bot.slash_command(name="історія", description="Історія змін доступу")
+@commands.has_any_role(*config["allowed_roles"])
+@check_channel()
+async def history(
+        interaction: disnake.ApplicationCommandInteraction,
+        steamid: str = commands.Param(
+            description="Стім-айді людини", default=None
+        ),
+        server: str = commands.Param(
+            choices=SERVER_CHOICES, description="Сервер", default=None
+        ),
+        actor: disnake.User = commands.Param(
+            description="Хто вносив зміни", default=None
+        ),
+):
+    if not journal:
+        await Response.send_ephemeral(interaction, "Журнал змін вимкнено")
+        return
+
+    if steamid:
+        steamid = await SteamAPI.clean_steamid64(steamid)
+        if not steamid:
+            await Response.send_ephemeral(interaction, "SteamID64 вказано невірно")
             return
 
+    await Response.send_ephemeral(interaction, "Очікуйте...")
+
+    changes = await journal.history(
+        steamid=steamid, server=server, actor_id=actor.id if actor else None
+    )
+    if not changes:
+        await Response.edit(interaction, "Змін не знайдено")
+        return
+
+    lines = []
+    for change in changes:
+        author = f"<@{change.actor_id}>" if change.actor_id else "—"
+        profile_link = await SteamAPI.get_steam_profile_link(change.steamid)
+        lines.append(
+            f"**#{change.id}** {Time.from_timestamp(change.created_at)} {author} "
+            f"({change.server}): [``{change.steamid}``]({profile_link}) "
+            f"{format_change(change)}\n"
+        )
+
+    await Response.edit_pages(interaction, "## Історія змін\n", lines)
+
+
+@bot.slash_command(name="відкат", description="Скасувати зміну доступу з історії")
+@commands.has_any_role(*config["allowed_roles"])
+@check_channel()
+async def rollback(
+        interaction: disnake.ApplicationCommandInteraction,
+        change_id: int = commands.Param(
+            name="номер", description="Номер зміни з /історія", ge=1
+        ),
+):
+    if not journal:
+        await Response.send_ephemeral(interaction, "Журнал змін вимкнено")
+        return
+
+    await interaction.response.defer()
+    change = await journal.get(change_id)
+    if change is None or change.server not in config["servers"]:
+        await Response.send_silent(interaction, "Зміну не знайдено")
+        return
+    if change.file == "ra_file" and change.old_value in config["prohibited_roles_names"]:
+        await Response.send_silent(interaction, "Цю роль заборонено видавати")
+        return
+
+    def edit(model):
+        if AuditJournal.current_value(model, change.steamid) != change.new_value:
+            return False
+        AuditJournal.set_value(model, change.steamid, change.old_value)
+        return True
+
+    if not await File.modify(change.server, change.file, edit):
+        await Response.send_silent(
+            interaction, "Після цієї зміни доступ користувача вже змінювали"
+        )
+        return
+
+    profile_link = await SteamAPI.get_steam_profile_link(change.steamid)
+    profile_name, profile_avatar = await SteamAPI.get_profile_name_and_avatar(change.steamid)
+    text = f"## [``{profile_name}``]({profile_link})\n"
+    text += (
+        f"### {change.server}\n Зміну **#{change.id}** скасовано: "
+        f"{format_change(change)}\n "
+    )
+    await Response.send(interaction, text, 0x36BE25, profile_avatar, True)
+
+
+@bot.slash_command(
+    name="метрики",
+    description="Затримки команд і їх етапів",
+    default_member_permissions=disnake.Permissions(administrator=True),
+)
+@commands.has_permissions(administrator=True)
+async def metrics(interaction: disnake.ApplicationCommandInteraction):
+    await Response.send_ephemeral(interaction, "Очікуйте...")
+
+    lines = []
+    for title, group_by in (("Етапи", "stage"), ("Команди", "command")):
+        lines.append(f"### {title}\n")
+        for name, count, p50, p95, p99 in Metrics.summary(group_by):
+            lines.append(
+                f"``{name}`` ({count}): p50 {p50 * 1000:.0f} мс, "
+                f"p95 {p95 * 1000:.0f} мс, p99 {p99 * 1000:.0f} мс\n"
+            )
+
+    lines.append("### Сервери\n")
+    for server in SERVER_CHOICES:
+        breaker = File.breaker(server)
+        state = "✅" if breaker.available() else f"⚠️ {breaker.state}, {breaker.last_error}"
+        lines.append(f"``{server}``: {state}\n")
+
+    cache_stats = SteamAPI.cache_stats()
+    lines.append("### Кеш Steam\n")
+    lines.append(
+        f"записів: {cache_stats['size']}, влучань: {cache_stats['hits']}, "
+        f"промахів: {cache_stats['misses']}, витіснень: {cache_stats['evictions']}\n"
+    )
+
+    await Response.edit_pages(interaction, "## Метрики\n", lines)
+
 
-bot.run(config["token"])
+if __name__ == "__main__":
+    bot.run(config["token"])
@@ -0,0 +1,99 @@
+import asyncio
+import itertools
+import random
+
+FIRST_STEAMID = 76561197960265728
+ROLES = ["owner", "admin", "moderator", "helper", "trainee", "eventer", "donator", "vip", "full"]
+
+interaction_ids = itertools.count(1)
+
+
+def steamids(count: int, offset: int = 0) -> list[str]:
+    return [str(FIRST_STEAMID + offset + index) for index in range(count)]
+
+
+def ra_file(members: list[str], roles=ROLES, newline="\n") -> str:
+    """A config_remoteadmin.txt with comments, role settings and permissions around the members."""
+    lines = ["# Remote admin configuration", "", "Members:"]
+    lines += [f" - {steamid}@steam: {random.choice(roles)}" for steamid in members]
+    lines += ["", "# Roles, the order is used as the role priority", "Roles:"]
+    lines += [f" - {role}" for role in roles]
+    lines.append("")
+    for role in roles:
+        lines += [f"{role}_badge: {role.upper()}", f"{role}_color: red", f"{role}_cover: true", ""]
+    lines += ["Permissions:", " - KickingAndShortTermBanning: [" + ", ".join(roles) + "]", ""]
+    return newline.join(lines)
+
+
+def user_list(entries: list[str], newline="\n") -> str:
+    lines = ["# Whitelisted / reserved slot users"]
+    lines += [f"{steamid}@steam" for steamid in entries]
+    return newline.join(lines) + newline
+
+
+class FakeData(dict):
+    @property
+    def name(self) -> str:
+        return self["name"]
+
+
+class FakeUser:
+    def __init__(self, user_id: int):
+        self.id = user_id
+        self.display_name = f"bench-{user_id}"
+        self.avatar = None
+        self.mention = f"<@{user_id}>"
+
+
+class FakeResponse:
+    def __init__(self, interaction):
+        self.interaction = interaction
+
+    async def defer(self, **kwargs) -> None:
+        await self.interaction.call("defer")
+
+    async def send_message(self, **kwargs) -> None:
+        await self.interaction.call("send_message", kwargs)
+
+    async def edit_message(self, **kwargs) -> None:
+        await self.interaction.call("edit_message", kwargs)
+
+
+class FakeInteraction:
+    """
+    Stands in for disnake.ApplicationCommandInteraction: every call to
+    Discord takes `latency` seconds and is recorded in `calls`.
+    """
+    def __init__(self, command: str, channel_id: int, latency: float = 0.0):
+        self.id = next(interaction_ids)
+        self.data = FakeData(name=command)
+        self.channel_id = channel_id
+        self.author = self.user = FakeUser(self.id)
+        self.response = FakeResponse(self)
+        self.filled_options = {}
+        self.command_failed = False
+        self.latency = latency
+        self.calls: list[tuple] = []
+
+    async def call(self, name: str, kwargs=None) -> None:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.calls.append((name, kwargs or {}))
+
+    async def send(self, **kwargs) -> None:
+        await self.call("send", kwargs)
+
+    async def edit_original_response(self, **kwargs) -> None:
+        view = kwargs.get("view")
+        if view is not None:
+            view.stop()
+        await self.call("edit_original_response", kwargs)
+
+    async def delete_original_response(self, **kwargs) -> None:
+        await self.call("delete_original_response", kwargs)
+
+    def last_description(self) -> str:
+        for _, kwargs in reversed(self.calls):
+            if kwargs.get("embed") is not None:
+                return kwargs["embed"].description or ""
+        return ""
@@ -0,0 +1,331 @@
+"""
+Offline benchmark of the slash command handlers.
+
+Starts a local SFTP server and a GetPlayerSummaries stand-in, fills
+the servers with synthetic RA, whitelist and reserved slots files and
+calls the handlers of app/main.py with fake interactions, then reports
+throughput and latency percentiles per command and per stage.
+
+    python -m benchmarks.run --entries 100000 --sftp-latency 20 --output results.json
+    python -m benchmarks.run --entries 100000 --sftp-latency 20 --baseline results.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from benchmarks.fixtures import FakeInteraction, ROLES, ra_file, steamids, user_list
+from benchmarks.servers import start_sftp_server, start_steam_server
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PASSWORD = "benchmark"
+CHANNEL_ID = 1
+PROHIBITED_ROLES = ["vip", "full"]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Offline benchmark of the bot commands")
+    parser.add_argument("--servers", type=int, default=3)
+    parser.add_argument("--entries", type=int, default=10000,
+                        help="members of every RA file and whitelist entries")
+    parser.add_argument("--iterations", type=int, default=50,
+                        help="calls of every command")
+    parser.add_argument("--concurrency", type=int, default=4,
+                        help="calls of the same command running at once")
+    parser.add_argument("--sftp-latency", type=float, default=0,
+                        help="ms before every SFTP answer")
+    parser.add_argument("--steam-latency", type=float, default=0,
+                        help="ms before every Steam API answer")
+    parser.add_argument("--steam-429-rate", type=float, default=0,
+                        help="share of Steam API requests answered with 429")
+    parser.add_argument("--steam-retry-after", type=float, default=0,
+                        help="Retry-After seconds of 429 answers")
+    parser.add_argument("--steam-rate", type=float, default=4,
+                        help="Steam API requests per second of the bot's rate limiter")
+    parser.add_argument("--steam-cache-ttl", type=float, default=3600,
+                        help="0 resolves every profile through the Steam API")
+    parser.add_argument("--discord-latency", type=float, default=0,
+                        help="ms of every Discord response")
+    parser.add_argument("--max-staleness", type=float, default=10,
+                        help="file_cache.max_staleness, 0 checks the files on every read")
+    parser.add_argument("--warm-up", action="store_true",
+                        help="run the start-up warm-up before measuring")
+    parser.add_argument("--scenarios", default=None,
+                        help="comma separated command names (all by default)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep", action="store_true",
+                        help="keep the working directory with the server files")
+    parser.add_argument("--output", default=None, help="write the results as JSON")
+    parser.add_argument("--baseline", default=None,
+                        help="results JSON to compare with, exits with 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="allowed p95 slowdown against the baseline")
+    return parser.parse_args()
+
+
+def server_names(args) -> dict:
+    return {
+        f"Server {index + 1}": {"username": f"bench{index + 1}", "port": str(7777 + index)}
+        for index in range(args.servers)
+    }
+
+
+def write_config(workdir, args, sftp_port, steam_port) -> None:
+    config = {
+        "token": "",
+        "address": "127.0.0.1",
+        "port": str(sftp_port),
+        "password": PASSWORD,
+        "path": "/config/",
+        "ra_file": "config_remoteadmin.txt",
+        "reserved_slots_file": "UserIDReservedSlots.txt",
+        "whitelist_file": "UserIDWhitelist.txt",
+        "perms_channel_id": CHANNEL_ID,
+        "prohibited_roles_names": PROHIBITED_ROLES,
+        "servers": server_names(args),
+        "allowed_roles": [1],
+        "file_cache": {"max_staleness": args.max_staleness},
+        "warm_up": False,
+        "sync": {"enabled": False},
+        "metrics": {"enabled": False},
+        "logging": {"console": False},
+        "steam_api_key": "benchmark",
+        "steam_api_url": f"http://127.0.0.1:{steam_port}",
+        "steam_rate_limit": {"rate": args.steam_rate, "burst": 10, "max_retries": 5},
+        "steam_cache": {
+            "ttl": args.steam_cache_ttl,
+            "max_size": max(5000, args.entries * args.servers),
+            "persist_path": None
+        }
+    }
+    with open(os.path.join(workdir, "config.json"), "w") as config_file:
+        json.dump(config, config_file, ensure_ascii=False, indent=4)
+
+
+def write_server_files(root, args) -> dict:
+    """Neighbouring servers share half of their members, like real ones do."""
+    data = {}
+    for index, (server, server_config) in enumerate(server_names(args).items()):
+        members = steamids(args.entries, offset=index * args.entries // 2)
+        whitelist = steamids(args.entries, offset=index * args.entries // 3)
+        reserved = steamids(max(1, args.entries // 10), offset=index * args.entries // 4)
+        directory = os.path.join(root, "config", server_config["port"])
+        os.makedirs(directory)
+        for filename, text in (
+                ("config_remoteadmin.txt", ra_file(members)),
+                ("UserIDWhitelist.txt", user_list(whitelist)),
+                ("UserIDReservedSlots.txt", user_list(reserved)),
+        ):
+            with open(os.path.join(directory, filename), "w", newline="") as file:
+                file.write(text)
+        data[server] = members
+    return data
+
+
+def scenarios(main, data, args) -> dict:
+    """{command name: (command, function returning random keyword arguments)}"""
+    servers = list(data)
+    grantable = [role for role in ROLES if role not in PROHIBITED_ROLES]
+    newcomers = steamids(args.entries, offset=args.servers * args.entries)
+
+    def member():
+        return random.choice(data[random.choice(servers)])
+
+    def bulk_entries():
+        return ";".join(
+            random.choice([
+                f"{random.choice(newcomers)} видати-роль {random.choice(grantable)}",
+                f"{member()} забрати-роль",
+                f"{random.choice(newcomers)} білий-список додати",
+                f"{member()} виділені-слоти видалити",
+            ])
+            for _ in range(10)
+        )
+
+    return {
+        "показати-користувача": (main.show_user, lambda: {
+            "steamid": member()
+        }),
+        "показати-користувачів": (main.show_users, lambda: {
+            "server": random.choice(servers),
+            "miscellaneous": random.choice([None, "whitelist", "reserved_slots"])
+        }),
+        "ролі-серверу": (main.server_roles, lambda: {
+            "server": random.choice(servers)
+        }),
+        "пошук-доступів": (main.search_access, lambda: {
+            "query": "role", "role": random.choice(ROLES)
+        }),
+        "видати-роль": (main.grant_role, lambda: {
+            "steamid": random.choice(newcomers),
+            "role": random.choice(grantable),
+            "server": random.choice(servers)
+        }),
+        "забрати-роль": (main.remove_role, lambda: {
+            "steamid": member(), "server": random.choice(servers)
+        }),
+        "білий-список": (main.white_list, lambda: {
+            "steamid": random.choice(newcomers),
+            "action": random.choice(["додати", "видалити"]),
+            "server": random.choice(servers)
+        }),
+        "виділені-слоти": (main.reserved_slots, lambda: {
+            "steamid": member(),
+            "action": random.choice(["додати", "видалити"]),
+            "server": random.choice(servers)
+        }),
+        "масові-зміни": (main.bulk_changes, lambda: {
+            "entries": bulk_entries(), "file": None, "servers": None
+        }),
+        "синхронізувати-сервери": (main.replicate, lambda: {
+            "source": random.choice(servers),
+            "choose": random.choice(["ra_file", "whitelist_file", "reserved_slots_file"]),
+            "servers": None,
+            "dry_run": random.choice([True, False])
+        }),
+    }
+
+
+async def run_scenario(name, command, make_kwargs, args) -> dict:
+    from utils.metrics import current_command, percentile
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies = []
+    errors = 0
+
+    async def call():
+        nonlocal errors
+        async with semaphore:
+            current_command.set(name)
+            interaction = FakeInteraction(name, CHANNEL_ID, args.discord_latency / 1000)
+            started = time.perf_counter()
+            try:
+                await command.callback(interaction, **make_kwargs())
+            except Exception as error:
+                errors += 1
+                print(f"{name}: {error!r}")
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(call() for _ in range(args.iterations)))
+    elapsed = time.perf_counter() - started
+    return {
+        "count": len(latencies),
+        "errors": errors,
+        "ops_per_second": len(latencies) / elapsed,
+        "p50": percentile(latencies, 0.5),
+        "p95": percentile(latencies, 0.95),
+        "p99": percentile(latencies, 0.99),
+    }
+
+
+def print_table(title, rows) -> None:
+    print(f"\n{title}")
+    print(f"{'':24} {'count':>7} {'ops/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for name, row in rows:
+        ops = f"{row['ops_per_second']:.1f}" if "ops_per_second" in row else ""
+        print(
+            f"{name:24} {row['count']:>7} {ops:>8} {row['p50'] * 1000:>9.1f} "
+            f"{row['p95'] * 1000:>9.1f} {row['p99'] * 1000:>9.1f} {row.get('errors', ''):>7}"
+        )
+
+
+def compare(results, baseline, tolerance) -> list[str]:
+    regressions = []
+    for name, row in results.items():
+        previous = baseline.get(name)
+        if not previous or not previous["p95"]:
+            continue
+        ratio = row["p95"] / previous["p95"]
+        if ratio > 1 + tolerance:
+            regressions.append(
+                f"{name}: p95 {previous['p95'] * 1000:.1f} -> {row['p95'] * 1000:.1f} ms (x{ratio:.2f})"
+            )
+    return regressions
+
+
+async def main(args) -> int:
+    random.seed(args.seed)
+    output = args.output and os.path.abspath(args.output)
+    baseline = args.baseline and os.path.abspath(args.baseline)
+    cwd = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix="scp-bot-bench-")
+    root = os.path.join(workdir, "remote")
+    data = write_server_files(root, args)
+
+    acceptor, sftp_port = await start_sftp_server(root, PASSWORD, args.sftp_latency / 1000)
+    runner, steam_port, steam_stats = await start_steam_server(
+        args.steam_latency / 1000, args.steam_429_rate, args.steam_retry_after
+    )
+    write_config(workdir, args, sftp_port, steam_port)
+
+    # The bot reads ./config.json and keeps its local file copies
+    # in the working directory, both at import time
+    os.chdir(workdir)
+    if REPO not in sys.path:
+        sys.path.insert(0, REPO)
+    import app.main as bot_main
+    from utils.file_manager import FileManager
+    from utils.metrics import Metrics
+    from utils.steam import SteamAPI
+    from utils.warmup import WarmUp
+
+    available = scenarios(bot_main, data, args)
+    names = args.scenarios.split(",") if args.scenarios else list(available)
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        print(f"Unknown scenarios: {', '.join(unknown)}")
+        return 2
+
+    print(
+        f"servers {args.servers}, entries {args.entries}, iterations {args.iterations}, "
+        f"concurrency {args.concurrency}, working directory {workdir}"
+    )
+    try:
+        if args.warm_up:
+            await WarmUp.run(bot_main.SERVER_CHOICES)
+
+        results = {}
+        for name in names:
+            command, make_kwargs = available[name]
+            results[name] = await run_scenario(name, command, make_kwargs, args)
+    finally:
+        await FileManager.close()
+        await SteamAPI.close()
+        acceptor.close()
+        await runner.cleanup()
+        os.chdir(cwd)
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print_table("Commands", results.items())
+    print_table("Stages", [
+        (name, {"count": count, "p50": p50, "p95": p95, "p99": p99})
+        for name, count, p50, p95, p99 in Metrics.summary("stage")
+    ])
+    print(
+        f"\nSteam API: requests {steam_stats.requests}, 429 {steam_stats.throttled}, "
+        f"profiles {steam_stats.players}; cache {SteamAPI.cache_stats()}"
+    )
+
+    if output:
+        with open(output, "w") as output_file:
+            json.dump(results, output_file, indent=4, ensure_ascii=False)
+
+    if baseline:
+        with open(baseline) as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.tolerance)
+        if regressions:
+            print("\nRegressions:\n" + "\n".join(regressions))
+            return 1
+        print("\nNo regressions against the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(parse_args())))
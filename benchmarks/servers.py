@@ -0,0 +1,139 @@
+import asyncio
+import random
+
+import asyncssh
+from aiohttp import web
+
+
+class LatencySFTPServer(asyncssh.SFTPServer):
+    """
+    SFTP server rooted in a local directory that waits `latency` seconds
+    before answering every request, like a remote game server would.
+    """
+    latency = 0.0
+
+    async def _delay(self) -> None:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    async def stat(self, path):
+        await self._delay()
+        return super().stat(path)
+
+    async def lstat(self, path):
+        await self._delay()
+        return super().lstat(path)
+
+    async def fstat(self, file_obj):
+        await self._delay()
+        return super().fstat(file_obj)
+
+    async def realpath(self, path):
+        await self._delay()
+        return super().realpath(path)
+
+    async def open(self, path, pflags, attrs):
+        await self._delay()
+        return super().open(path, pflags, attrs)
+
+    async def read(self, file_obj, offset, size):
+        await self._delay()
+        return super().read(file_obj, offset, size)
+
+    async def write(self, file_obj, offset, data):
+        await self._delay()
+        return super().write(file_obj, offset, data)
+
+    async def close(self, file_obj):
+        await self._delay()
+        return super().close(file_obj)
+
+    async def rename(self, oldpath, newpath):
+        await self._delay()
+        return super().rename(oldpath, newpath)
+
+    async def posix_rename(self, oldpath, newpath):
+        await self._delay()
+        return super().posix_rename(oldpath, newpath)
+
+    async def remove(self, path):
+        await self._delay()
+        return super().remove(path)
+
+
+class PasswordServer(asyncssh.SSHServer):
+    password = ""
+
+    def begin_auth(self, username: str) -> bool:
+        return True
+
+    def password_auth_supported(self) -> bool:
+        return True
+
+    def validate_password(self, username: str, password: str) -> bool:
+        return password == self.password
+
+
+async def start_sftp_server(root: str, password: str, latency: float = 0.0):
+    """
+    Starts an SSH server on a free local port that accepts any username
+    with the given password and serves root over SFTP.
+    Returns (acceptor, port).
+    """
+    server_class = type("BenchmarkServer", (PasswordServer,), {"password": password})
+    sftp_class = type("BenchmarkSFTPServer", (LatencySFTPServer,), {"latency": latency})
+    acceptor = await asyncssh.create_server(
+        server_class, "127.0.0.1", 0,
+        server_host_keys=[asyncssh.generate_private_key("ssh-ed25519")],
+        sftp_factory=lambda chan: sftp_class(chan, chroot=root.encode()),
+        allow_scp=False
+    )
+    return acceptor, acceptor.get_port()
+
+
+class SteamStats:
+    def __init__(self):
+        self.requests = 0
+        self.throttled = 0
+        self.players = 0
+
+
+async def start_steam_server(
+        latency: float = 0.0,
+        throttle_rate: float = 0.0,
+        retry_after: float = 0.0
+):
+    """
+    Starts a GetPlayerSummaries stand-in on a free local port. Every request
+    waits `latency` seconds, and a throttle_rate share of them is answered
+    with 429 and a Retry-After header. Returns (runner, port, stats).
+    """
+    stats = SteamStats()
+
+    async def player_summaries(request):
+        stats.requests += 1
+        if latency:
+            await asyncio.sleep(latency)
+        if random.random() < throttle_rate:
+            stats.throttled += 1
+            return web.Response(status=429, headers={"Retry-After": str(retry_after)})
+
+        steamids = [
+            steamid for steamid in request.query.get("steamids", "").split(",") if steamid
+        ]
+        stats.players += len(steamids)
+        return web.json_response({"response": {"players": [
+            {
+                "steamid": steamid,
+                "personaname": f"Player {steamid[-5:]}",
+                "avatarfull": f"https://avatars.example/{steamid}.jpg"
+            }
+            for steamid in steamids
+        ]}})
+
+    app = web.Application()
+    app.router.add_get("/ISteamUser/GetPlayerSummaries/v0002/", player_summaries)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", 0).start()
+    return runner, runner.addresses[0][1], stats
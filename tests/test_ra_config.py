@@ -0,0 +1,119 @@
+from utils.ra_config import RAConfig
+
+TEXT = (
+    "# Remote admin configuration\r\n"
+    "\r\n"
+    "Members:\r\n"
+    " - 76561197960265728@steam: owner # server owner\r\n"
+    "  -  76561197960265729@steam:admin\r\n"
+    "# - 76561197960265730@steam: helper\r\n"
+    "\r\n"
+    "Roles:\r\n"
+    " - owner\r\n"
+    " - admin\r\n"
+    " - helper\r\n"
+    "\r\n"
+    "owner_badge: OWNER\r\n"
+)
+
+
+def test_round_trip_is_exact():
+    config = RAConfig(TEXT)
+    assert config.to_text() == TEXT
+    assert config.get_role("76561197960265728") == "owner"
+    assert config.get_role("76561197960265729") == "admin"
+    assert config.get_role("76561197960265730") is None
+    assert config.roles == ["owner", "admin", "helper"]
+
+
+def test_edits_keep_comments_and_line_endings():
+    config = RAConfig(TEXT)
+    config.set_role("76561197960265728", "admin")
+    config.remove_member("76561197960265729")
+    config.set_role("76561197960265731", "helper")
+
+    assert config.to_text() == (
+        "# Remote admin configuration\r\n"
+        "\r\n"
+        "Members:\r\n"
+        " - 76561197960265731@steam: helper\r\n"
+        " - 76561197960265728@steam: admin # server owner\r\n"
+        "# - 76561197960265730@steam: helper\r\n"
+        "\r\n"
+        "Roles:\r\n"
+        " - owner\r\n"
+        " - admin\r\n"
+        " - helper\r\n"
+        "\r\n"
+        "owner_badge: OWNER\r\n"
+    )
+    assert sorted(config.changes()) == [
+        ("76561197960265728", "owner", "admin"),
+        ("76561197960265729", "admin", None),
+        ("76561197960265731", None, "helper"),
+    ]
+
+
+def test_duplicate_members_are_edited_and_removed_together():
+    text = (
+        "Members:\n"
+        " - 76561197960265728@steam: owner\n"
+        " - 76561197960265728@steam: helper\n"
+    )
+    config = RAConfig(text)
+    assert config.get_role("76561197960265728") == "owner"
+
+    config.set_role("76561197960265728", "admin")
+    assert config.to_text() == (
+        "Members:\n"
+        " - 76561197960265728@steam: admin\n"
+        " - 76561197960265728@steam: admin\n"
+    )
+    config.remove_member("76561197960265728")
+    assert config.to_text() == "Members:\n"
+    assert config.get_role("76561197960265728") is None
+
+
+def test_members_header_at_end_of_file():
+    config = RAConfig("Roles:\n - admin\nMembers:")
+    config.set_role("76561197960265728", "admin")
+    assert config.to_text() == (
+        "Roles:\n"
+        " - admin\n"
+        "Members:\n"
+        " - 76561197960265728@steam: admin\n"
+    )
+    assert RAConfig(config.to_text()).get_role("76561197960265728") == "admin"
+
+
+def test_missing_members_header_is_added():
+    config = RAConfig("Roles:\r\n - admin")
+    config.set_role("76561197960265728", "admin")
+    assert config.to_text() == (
+        "Roles:\r\n"
+        " - admin\r\n"
+        "Members:\r\n"
+        " - 76561197960265728@steam: admin\r\n"
+    )
+
+
+def test_remove_then_add_again():
+    config = RAConfig(TEXT)
+    config.remove_member("76561197960265729")
+    assert "76561197960265729" not in config.to_text()
+
+    config.set_role("76561197960265729", "helper")
+    assert config.get_role("76561197960265729") == "helper"
+    assert config.to_text().count("76561197960265729@steam: helper\r\n") == 1
+    # Back to its old role the member is not a change any more
+    config.set_role("76561197960265729", "admin")
+    assert config.changes() == []
+
+
+def test_copy_is_independent():
+    config = RAConfig(TEXT)
+    clone = config.copy()
+    clone.set_role("76561197960265731", "helper")
+    assert config.to_text() == TEXT
+    assert config.get_role("76561197960265731") is None
+    assert clone.get_role("76561197960265731") == "helper"
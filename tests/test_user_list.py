@@ -0,0 +1,57 @@
+from utils.user_list import UserList
+
+TEXT = (
+    "# Whitelisted players\r\n"
+    "76561197960265728@steam\r\n"
+    "\r\n"
+    "76561197960265729@steam # friend of the owner\r\n"
+    "# 76561197960265730@steam\r\n"
+)
+
+
+def test_round_trip_is_exact():
+    users = UserList(TEXT)
+    assert users.to_text() == TEXT
+    assert users.steamids() == ["76561197960265728", "76561197960265729"]
+    assert "76561197960265730" not in users
+
+
+def test_edits_keep_comments_and_line_endings():
+    users = UserList(TEXT)
+    assert users.remove("76561197960265728")
+    assert users.add("76561197960265731")
+    assert users.to_text() == (
+        "# Whitelisted players\r\n"
+        "\r\n"
+        "76561197960265729@steam # friend of the owner\r\n"
+        "# 76561197960265730@steam\r\n"
+        "76561197960265731@steam\r\n"
+    )
+    assert sorted(users.changes()) == [
+        ("76561197960265728", True, False),
+        ("76561197960265731", False, True),
+    ]
+
+
+def test_duplicate_entries_are_removed_together():
+    users = UserList("76561197960265728@steam\n76561197960265728@steam\n")
+    assert len(users) == 1
+    assert not users.add("76561197960265728")
+    assert users.remove("76561197960265728")
+    assert users.to_text() == ""
+    assert not users.remove("76561197960265728")
+
+
+def test_add_after_last_line_without_newline():
+    users = UserList("76561197960265728@steam")
+    users.add("76561197960265729")
+    assert users.to_text() == "76561197960265728@steam\n76561197960265729@steam\n"
+
+
+def test_remove_then_add_again():
+    users = UserList(TEXT)
+    users.remove("76561197960265729")
+    users.add("76561197960265729")
+    assert "76561197960265729" in users
+    assert users.to_text().count("76561197960265729@steam") == 1
+    assert users.changes() == []
@@ -0,0 +1,173 @@
+import asyncio
+import contextvars
+import sqlite3
+import time
+
+from utils.config import config
+from utils.metrics import current_command
+
+audit_config = config.get("audit", {})
+
+# (Discord user id, user name) of the command being run, set before every slash command
+current_actor = contextvars.ContextVar("current_actor", default=(None, None))
+
+# Value of a whitelist / reserved slots entry, None means the SteamID is not listed
+LISTED = "listed"
+
+
+class Change:
+    def __init__(self, row: tuple):
+        (
+            self.id, self.created_at, self.actor_id, self.actor, self.command,
+            self.server, self.file, self.steamid, self.old_value, self.new_value
+        ) = row
+
+
+class AuditJournal:
+    """
+    Append-only journal of every permission change in SQLite (WAL mode).
+    Changes are taken from the models uploaded by FileManager, queued in
+    memory and written in batches from a worker thread, so recording
+    adds no latency to the command. Every batch is one fsynced commit.
+    """
+    columns = (
+        "id, created_at, actor_id, actor, command, server, file, steamid, "
+        "old_value, new_value"
+    )
+
+    def __init__(self, path: str, flush_interval: float = 1, batch_size: int = 100):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._pending: list[tuple] = []
+        self._flush_task: asyncio.Task | None = None
+        self._tasks: set[asyncio.Task] = set()
+        self._db_lock = asyncio.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=FULL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS changes ("
+            "id INTEGER PRIMARY KEY, created_at REAL, actor_id INTEGER, actor TEXT, "
+            "command TEXT, server TEXT, file TEXT, steamid TEXT, "
+            "old_value TEXT, new_value TEXT)"
+        )
+        for column in ("steamid", "server", "actor_id"):
+            self._db.execute(
+                f"CREATE INDEX IF NOT EXISTS changes_{column} ON changes ({column}, id)"
+            )
+        self._db.commit()
+
+    def record(self, server, choose, model) -> None:
+        """FileManager listener: queues the changes of an uploaded model."""
+        changes = model.changes()
+        if not changes:
+            return
+        actor_id, actor = current_actor.get()
+        created_at = time.time()
+        for steamid, old_value, new_value in changes:
+            if isinstance(old_value, bool):
+                old_value = LISTED if old_value else None
+                new_value = LISTED if new_value else None
+            self._pending.append((
+                created_at, actor_id, actor, current_command.get(),
+                server, choose, steamid, old_value, new_value
+            ))
+
+        if len(self._pending) >= self.batch_size:
+            self._spawn(self.flush())
+        elif self._flush_task is None or self._flush_task.done():
+            self._flush_task = self._spawn(self._flush_later())
+
+    def _spawn(self, coroutine) -> asyncio.Task:
+        task = asyncio.create_task(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.flush_interval)
+        await self.flush()
+
+    async def flush(self) -> None:
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        async with self._db_lock:
+            await asyncio.to_thread(self._write, pending)
+
+    async def close(self) -> None:
+        """Writes the changes still queued and closes the database."""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self.flush()
+        async with self._db_lock:
+            self._db.close()
+
+    def _write(self, rows: list[tuple]) -> None:
+        with self._db:
+            self._db.executemany(
+                "INSERT INTO changes (created_at, actor_id, actor, command, server, "
+                "file, steamid, old_value, new_value) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+
+    async def _query(self, sql: str, parameters: tuple) -> list[tuple]:
+        await self.flush()
+        async with self._db_lock:
+            return await asyncio.to_thread(
+                lambda: self._db.execute(sql, parameters).fetchall()
+            )
+
+    async def history(
+            self,
+            steamid: str | None = None,
+            server: str | None = None,
+            actor_id: int | None = None,
+            limit: int = 200
+    ) -> list[Change]:
+        """The newest changes matching all of the given filters."""
+        filters = []
+        parameters = []
+        for column, value in (("steamid", steamid), ("server", server), ("actor_id", actor_id)):
+            if value is not None:
+                filters.append(f"{column} = ?")
+                parameters.append(value)
+        where = f"WHERE {' AND '.join(filters)} " if filters else ""
+        rows = await self._query(
+            f"SELECT {self.columns} FROM changes {where}ORDER BY id DESC LIMIT ?",
+            (*parameters, limit)
+        )
+        return [Change(row) for row in rows]
+
+    async def get(self, change_id: int) -> Change | None:
+        rows = await self._query(
+            f"SELECT {self.columns} FROM changes WHERE id = ?", (change_id,)
+        )
+        return Change(rows[0]) if rows else None
+
+    @staticmethod
+    def current_value(model, steamid: str) -> str | None:
+        if hasattr(model, "get_role"):
+            return model.get_role(steamid)
+        return LISTED if steamid in model else None
+
+    @staticmethod
+    def set_value(model, steamid: str, value: str | None) -> None:
+        """Puts the SteamID's entry of a model back to a journaled value."""
+        if hasattr(model, "get_role"):
+            if value is None:
+                model.remove_member(steamid)
+            else:
+                model.set_role(steamid, value)
+        elif value is None:
+            model.remove(steamid)
+        else:
+            model.add(steamid)
+
+
+journal = AuditJournal(
+    audit_config.get("path", "audit.sqlite3"),
+    flush_interval=audit_config.get("flush_interval", 1),
+    batch_size=audit_config.get("batch_size", 100)
+) if audit_config.get("enabled", True) else None
@@ -0,0 +1,58 @@
+import bisect
+
+from utils.file_manager import FileManager
+
+# Discord shows at most 25 autocomplete suggestions
+MAX_SUGGESTIONS = 25
+
+
+class PrefixIndex:
+    def __init__(self, choices: dict[str, str]):
+        """choices: {value: shown name}"""
+        self.choices = choices
+        self.keys = sorted((value.lower(), value) for value in choices)
+
+    def search(self, prefix: str) -> dict[str, str]:
+        prefix = prefix.lower().strip()
+        start = bisect.bisect_left(self.keys, (prefix,))
+        result = {}
+        for key, value in self.keys[start:start + MAX_SUGGESTIONS]:
+            if not key.startswith(prefix):
+                break
+            result[self.choices[value]] = value
+        return result
+
+
+class Autocomplete:
+    """
+    Autocomplete suggestions served only from the cached parsed files,
+    so they never wait for the network and fit Discord's 3-second
+    deadline. Indexes are rebuilt only when the cached model changes.
+    """
+    _indexes: dict[tuple, tuple] = {}
+
+    @staticmethod
+    def _index(server, kind, build) -> PrefixIndex | None:
+        model = FileManager.cached(server, "ra_file")
+        if model is None:
+            return None
+        cached = Autocomplete._indexes.get((server, kind))
+        if cached is None or cached[0] is not model:
+            cached = (model, PrefixIndex(build(model)))
+            Autocomplete._indexes[(server, kind)] = cached
+        return cached[1]
+
+    @staticmethod
+    def roles(server, prefix, prohibited_roles) -> dict[str, str]:
+        index = Autocomplete._index(server, "roles", lambda model: {
+            role: role for role in model.roles if role not in prohibited_roles
+        })
+        return index.search(prefix) if index else {}
+
+    @staticmethod
+    def members(server, prefix) -> dict[str, str]:
+        index = Autocomplete._index(server, "members", lambda model: {
+            steamid: f"{steamid} ({role})"
+            for steamid, role in model.members.items()
+        })
+        return index.search(prefix) if index else {}
@@ -0,0 +1,86 @@
+import re
+
+files = {
+    "видати-роль": "ra_file",
+    "забрати-роль": "ra_file",
+    "білий-список": "whitelist_file",
+    "виділені-слоти": "reserved_slots_file",
+}
+
+
+class BulkEntry:
+    def __init__(self, steamid: str, command: str, argument: str | None):
+        self.steamid = steamid
+        self.command = command
+        self.argument = argument
+
+    @property
+    def file(self) -> str:
+        return files[self.command]
+
+
+class BulkChanges:
+    """
+    Parses and applies many permission changes at once. Every entry is
+    "<steamid> <command> [argument]", where command is one of the slash
+    command names: "видати-роль <role>", "забрати-роль",
+    "білий-список додати|видалити", "виділені-слоти додати|видалити".
+    Entries are separated by new lines or ";".
+    """
+    @staticmethod
+    def parse(text: str, prohibited_roles) -> tuple[list[BulkEntry], list[str]]:
+        entries = []
+        errors = []
+        for raw_entry in re.split(r"[;\n]", text):
+            tokens = raw_entry.split()
+            if not tokens:
+                continue
+            steamid = re.sub(r"\D", "", tokens[0])
+            command = tokens[1] if len(tokens) > 1 else None
+            argument = tokens[2] if len(tokens) > 2 else None
+
+            if len(steamid) != 17:
+                errors.append(f"``{raw_entry.strip()}`` – SteamID64 вказано невірно")
+            elif command not in files:
+                errors.append(f"``{raw_entry.strip()}`` – невідома дія")
+            elif command == "видати-роль" and not argument:
+                errors.append(f"``{raw_entry.strip()}`` – не вказана роль")
+            elif command == "видати-роль" and argument in prohibited_roles:
+                errors.append(f"``{raw_entry.strip()}`` – цю роль заборонено видавати")
+            elif command in ("білий-список", "виділені-слоти") and argument not in ("додати", "видалити"):
+                errors.append(f"``{raw_entry.strip()}`` – вкажіть додати або видалити")
+            else:
+                entries.append(BulkEntry(steamid, command, argument))
+        return entries, errors
+
+    @staticmethod
+    def apply_entry(model, entry: BulkEntry) -> str:
+        if entry.command == "видати-роль":
+            old_role = model.get_role(entry.steamid)
+            if not model.contains_role(entry.argument):
+                return f"роль **``{entry.argument}``** відсутня на сервері"
+            if old_role == entry.argument:
+                return "вже має вказану роль"
+            model.set_role(entry.steamid, entry.argument)
+            if old_role:
+                return f"роль **``{entry.argument}``** замінила **``{old_role}``**"
+            return f"видана роль **``{entry.argument}``**"
+
+        if entry.command == "забрати-роль":
+            old_role = model.get_role(entry.steamid)
+            if not old_role:
+                return "немає ролі на сервері"
+            model.remove_member(entry.steamid)
+            return f"знята роль **``{old_role}``**"
+
+        if entry.argument == "додати":
+            return "доданий" if model.add(entry.steamid) else "вже доданий"
+        return "видалений" if model.remove(entry.steamid) else "відсутній у списку"
+
+    @staticmethod
+    def apply(model, entries: list[BulkEntry]) -> list[str]:
+        """
+        Applies entries of one file to its model in memory,
+        so the file is uploaded only once for all of them.
+        """
+        return [BulkChanges.apply_entry(model, entry) for entry in entries]
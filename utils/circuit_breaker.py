@@ -0,0 +1,55 @@
+import time
+
+
+class CircuitOpenError(ConnectionError):
+    """Raised instead of contacting a server that keeps failing."""
+
+
+class CircuitBreaker:
+    """
+    Health of one server. After failure_threshold consecutive connection
+    errors the circuit opens and calls fail at once with CircuitOpenError.
+    Once reset_timeout seconds passed, a single call is let through
+    (half-open): if it succeeds the circuit closes, otherwise it opens again.
+    """
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.last_error: str | None = None
+        self.last_success: float | None = None
+        self._probing = False
+
+    def before(self) -> None:
+        if self.state == "closed":
+            return
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = "half_open"
+        if self.state == "half_open" and not self._probing:
+            self._probing = True
+            return
+        raise CircuitOpenError(f"server unavailable: {self.last_error}")
+
+    def success(self) -> None:
+        self.state = "closed"
+        self.failures = 0
+        self.last_success = time.time()
+        self._probing = False
+
+    def failure(self, error: BaseException) -> None:
+        self.failures += 1
+        self.last_error = repr(error)
+        self._probing = False
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def release(self) -> None:
+        """Ends a half-open probe that was cancelled without an answer."""
+        self._probing = False
+
+    def available(self) -> bool:
+        """False from the first failed call until the next successful one."""
+        return self.state == "closed" and self.failures == 0
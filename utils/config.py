@@ -0,0 +1,9 @@
+import json
+
+
+def load_config(path: str = "./config.json") -> dict:
+    with open(path, "r") as config_file:
+        return json.load(config_file)
+
+
+config = load_config()
@@ -0,0 +1,59 @@
+import disnake
+from disnake.ext import commands
+
+from utils.config import config
+
+cooldown_config = config.get("rejection_cooldown", {})
+
+
+class DiscordCache:
+    """
+    Channel objects and allowed role mentions resolved once and kept
+    until a gateway event changes them, so rejecting a command never
+    needs a REST request. Rejections are also rate limited per user:
+    past the cooldown, repeated misuse is ignored without any reply.
+    """
+    channels: dict[int, disnake.abc.GuildChannel] = {}
+    role_mentions: dict[int, list[str]] = {}
+    rejections = commands.CooldownMapping.from_cooldown(
+        cooldown_config.get("rate", 2),
+        cooldown_config.get("per", 60),
+        commands.BucketType.user
+    )
+
+    @staticmethod
+    async def channel(bot, channel_id: int):
+        channel = DiscordCache.channels.get(channel_id)
+        if channel is None:
+            channel = bot.get_channel(channel_id) or await bot.fetch_channel(channel_id)
+            DiscordCache.channels[channel_id] = channel
+        return channel
+
+    @staticmethod
+    def allowed_role_mentions(guild) -> list[str]:
+        mentions = DiscordCache.role_mentions.get(guild.id)
+        if mentions is None:
+            mentions = [
+                role.mention
+                for role_id in config.get("allowed_roles", [])
+                if (role := guild.get_role(role_id))
+            ]
+            DiscordCache.role_mentions[guild.id] = mentions
+        return mentions
+
+    @staticmethod
+    def invalidate_channel(channel_id: int) -> None:
+        DiscordCache.channels.pop(channel_id, None)
+
+    @staticmethod
+    def invalidate_roles(guild_id: int) -> None:
+        DiscordCache.role_mentions.pop(guild_id, None)
+
+    @staticmethod
+    def may_reject(interaction) -> bool:
+        """
+        Whether a rejected command should still be answered,
+        False while the user is on cooldown for rejected commands.
+        """
+        bucket = DiscordCache.rejections.get_bucket(interaction)
+        return bucket.update_rate_limit() is None
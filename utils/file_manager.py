@@ -1,65 +1,423 @@
-import json
+import asyncio
+import contextlib
+import os
+import time
+import uuid
 
 import aiofiles
 import asyncssh
-from asyncssh import SSHClientConnection
 
-with open("./config.json", "r") as config_file:
-    config = json.load(config_file)
+from utils.circuit_breaker import CircuitBreaker
+from utils.config import config
+from utils.metrics import Metrics
+from utils.ra_config import RAConfig
+from utils.ssh_pool import SSHPool
+from utils.user_list import UserList
+
+pool_config = config.get("ssh_pool", {})
+health_config = config.get("server_health", {})
+pool = SSHPool(
+    max_per_host=pool_config.get("max_per_host", 4),
+    idle_timeout=pool_config.get("idle_timeout", 300),
+    health_check_after=pool_config.get("health_check_after", 30),
+    connect_timeout=health_config.get("connect_timeout", 5)
+)
+
+parsers = {
+    "ra_file": RAConfig,
+    "whitelist_file": UserList,
+    "reserved_slots_file": UserList,
+}
+
+
+class FileConflictError(Exception):
+    pass
+
+
+class CachedFile:
+    def __init__(self):
+        # The model and the remote stat of the text it was parsed from
+        self.stat: tuple | None = None
+        self.checked_at = 0.0
+        self.model = None
+        # Serializes refreshes, so a slower one never overwrites a newer model
+        self.refreshing = asyncio.Lock()
+        # Set while put uploads the file, readers then keep the cached copy
+        self.putting = False
+
+    def age(self) -> float:
+        return time.monotonic() - self.checked_at
 
 
 class FileManager:
+    max_staleness = config.get("file_cache", {}).get("max_staleness", 10)
+    max_concurrent_servers = config.get("fan_out", {}).get("max_concurrent_servers", 4)
+    remote_backups = config.get("remote_backups", 5)
+    block_size = config.get("transfer", {}).get("block_size", 65536)
+    max_requests = config.get("transfer", {}).get("max_requests", 16)
+    max_conflict_retries = config.get("file_cache", {}).get("max_conflict_retries", 3)
+    connect_timeout = pool.connect_timeout
+    read_timeout = health_config.get("read_timeout", 10)
+    mirror_staleness = 0
+    cache: dict[tuple, CachedFile] = {}
+    listeners: list = []
+    locks: dict[tuple, asyncio.Lock] = {}
+    breakers: dict[str, CircuitBreaker] = {}
+
     @staticmethod
-    async def _init_ssh_client(server) -> SSHClientConnection:
+    def _connection_params(server) -> tuple:
         server_config = config["servers"][server]
-        sftp_host = config["address"]
-        sftp_port = int(config["port"])
-        sftp_password = config["password"]
-        sftp_username = server_config["username"]
-
-        ssh_client = await asyncssh.connect(
-            sftp_host,
-            port=sftp_port,
-            username=sftp_username,
-            password=sftp_password,
-            known_hosts=None
+        return (
+            config["address"],
+            int(config["port"]),
+            server_config["username"],
+            config["password"]
         )
-        return ssh_client
 
     @staticmethod
-    async def _transfer_file(server, choose, action) -> None:
-        server_config = config["servers"][server]
+    def local_path(server, choose) -> str:
+        return config["servers"][server]["port"] + "-" + config[choose]
 
-        local_file_path = server_config["port"] + "-" + config[choose]
-        remote_file_path = config["path"] + server_config["port"] + "/" + config[choose]
+    @staticmethod
+    def remote_path(server, choose) -> str:
+        return config["path"] + config["servers"][server]["port"] + "/" + config[choose]
 
-        async with await FileManager._init_ssh_client(server) as ssh_client:
-            async with ssh_client.start_sftp_client() as sftp:
-                if action == "put":
-                    async with aiofiles.open(local_file_path, "rb") as local_file:
-                        file_data = await local_file.read()
-                        async with sftp.open(remote_file_path, "wb") as remote_file:
-                            await remote_file.write(file_data)
-                elif action == "get":
-                    async with sftp.open(remote_file_path, "rb") as remote_file:
-                        file_data = await remote_file.read()
-                        async with aiofiles.open(local_file_path, "wb") as local_file:
-                            await local_file.write(file_data)
+    @staticmethod
+    def breaker(server) -> CircuitBreaker:
+        breaker = FileManager.breakers.get(server)
+        if breaker is None:
+            breaker = FileManager.breakers[server] = CircuitBreaker(
+                failure_threshold=health_config.get("failure_threshold", 3),
+                reset_timeout=health_config.get("reset_timeout", 30)
+            )
+        return breaker
 
     @staticmethod
-    async def put(server, choose) -> None:
-        await FileManager._transfer_file(server, choose, "put")
+    def is_available(server) -> bool:
+        return FileManager.breaker(server).available()
 
     @staticmethod
-    async def get(server, choose) -> None:
-        await FileManager._transfer_file(server, choose, "get")
+    async def _run(server, operation):
+        """
+        Runs operation(sftp) on a pooled connection within read_timeout.
+        Fails at once with CircuitOpenError while the server's circuit is open.
+        """
+        breaker = FileManager.breaker(server)
+        breaker.before()
+        try:
+            result = await FileManager._attempt(server, operation)
+        except asyncssh.SFTPError:
+            # The server answered, only the request itself failed
+            breaker.success()
+            raise
+        except (asyncssh.Error, OSError, asyncio.TimeoutError) as error:
+            breaker.failure(error)
+            raise
+        except BaseException:
+            breaker.release()
+            raise
+        breaker.success()
+        return result
+
+    @staticmethod
+    async def _attempt(server, operation):
+        # read_timeout starts once a connection is checked out, time spent
+        # waiting for a free one in the pool is not the server's failure
+        params = FileManager._connection_params(server)
+        try:
+            return await pool.run(*params, operation, FileManager.read_timeout)
+        except (asyncssh.DisconnectError, asyncssh.ConnectionLost, ConnectionError):
+            # A pooled connection may have been dropped by the remote side,
+            # the broken one is discarded by the pool, so retry once
+            return await pool.run(*params, operation, FileManager.read_timeout)
+
+    @staticmethod
+    async def _transfer_file(server, choose, action, sftp, local_file_path) -> None:
+        """
+        Streams the file in block_size chunks with up to max_requests
+        of them in flight, so memory use does not depend on file size.
+        """
+        remote_file_path = FileManager.remote_path(server, choose)
+
+        with Metrics.span(f"sftp_{action}", server):
+            if action == "put":
+                temp_file_path = f"{remote_file_path}.tmp-{uuid.uuid4().hex}"
+                try:
+                    await sftp.put(
+                        local_file_path, temp_file_path,
+                        block_size=FileManager.block_size,
+                        max_requests=FileManager.max_requests
+                    )
+                    await FileManager._backup(remote_file_path, sftp)
+                    await FileManager._replace(temp_file_path, remote_file_path, sftp)
+                except BaseException:
+                    try:
+                        await sftp.remove(temp_file_path)
+                    except (asyncssh.Error, OSError):
+                        pass
+                    raise
+                await FileManager._prune_backups(remote_file_path, sftp)
+            elif action == "get":
+                await sftp.get(
+                    remote_file_path, local_file_path,
+                    block_size=FileManager.block_size,
+                    max_requests=FileManager.max_requests
+                )
+
+    @staticmethod
+    async def _replace(source, destination, sftp) -> None:
+        """
+        Swaps the uploaded temp file in, so the server never sees a partly
+        written file. Without the posix-rename extension, plain SFTP rename
+        refuses to overwrite, so the old file is removed right before it.
+        """
+        try:
+            await sftp.posix_rename(source, destination)
+        except asyncssh.SFTPOpUnsupported:
+            try:
+                await sftp.remove(destination)
+            except asyncssh.SFTPNoSuchFile:
+                pass
+            await sftp.rename(source, destination)
+
+    @staticmethod
+    async def _backup(remote_file_path, sftp) -> None:
+        if FileManager.remote_backups <= 0:
+            return
+        try:
+            await sftp.copy(
+                remote_file_path,
+                f"{remote_file_path}.bak-{time.strftime('%Y%m%d-%H%M%S')}"
+            )
+        except asyncssh.SFTPNoSuchFile:
+            pass
+
+    @staticmethod
+    async def _prune_backups(remote_file_path, sftp) -> None:
+        if FileManager.remote_backups <= 0:
+            return
+        directory, filename = remote_file_path.rsplit("/", 1)
+        try:
+            backups = sorted(
+                name for name in await sftp.listdir(directory)
+                if name.startswith(f"{filename}.bak-")
+            )
+            for name in backups[:-FileManager.remote_backups]:
+                await sftp.remove(f"{directory}/{name}")
+        except asyncssh.SFTPError:
+            # Old backups are only cleaned up, the upload itself succeeded
+            pass
+
+    @staticmethod
+    async def _stat(server, choose, sftp) -> tuple:
+        with Metrics.span("sftp_stat", server):
+            attrs = await sftp.stat(FileManager.remote_path(server, choose))
+        return attrs.mtime, attrs.size
+
+    @staticmethod
+    async def _refresh(server, choose, sftp) -> bool:
+        """
+        Downloads and parses the file if its remote stat changed, called
+        with entry.refreshing held. The cached model is kept until the new
+        one is parsed, so a failed download still leaves it to serve, and
+        it is replaced together with its stat.
+        Returns True if the file was downloaded.
+        """
+        entry = FileManager.cache[(server, choose)]
+        if entry.putting:
+            # The local copy must not be replaced while it is being uploaded,
+            # the upload itself updates the cache once it is done
+            return False
+        stat = await FileManager._stat(server, choose, sftp)
+        if stat == entry.stat and entry.model is not None:
+            entry.checked_at = time.monotonic()
+            return False
+
+        local_file_path = FileManager.local_path(server, choose)
+        # Unique, as a put may replace the local copy meanwhile
+        temp_file_path = f"{local_file_path}.part-{uuid.uuid4().hex}"
+        try:
+            await FileManager._transfer_file(server, choose, "get", sftp, temp_file_path)
+            text = await FileManager.read(temp_file_path, newline="")
+            with Metrics.span("parse", server):
+                model = parsers[choose](text)
+            os.replace(temp_file_path, local_file_path)
+        except BaseException:
+            try:
+                os.remove(temp_file_path)
+            except OSError:
+                pass
+            raise
+        entry.model = model
+        entry.stat = stat
+        entry.checked_at = time.monotonic()
+        FileManager._notify(server, choose, model)
+        return True
 
     @staticmethod
-    async def read(filename) -> str:
-        async with aiofiles.open(filename, "r", encoding="utf-8") as file:
+    async def put(server, choose, model, expected_stat) -> None:
+        """
+        Uploads the model, written to a temp file of its own first, and
+        remembers the new remote stat so the next load skips the download.
+        The local copy only becomes the uploaded text once the upload
+        succeeded. If the remote file no longer has expected_stat,
+        FileConflictError is raised and nothing is uploaded.
+        """
+        entry = FileManager.cache.setdefault((server, choose), CachedFile())
+        local_file_path = FileManager.local_path(server, choose)
+        upload_file_path = f"{local_file_path}.upload-{uuid.uuid4().hex}"
+        await FileManager.write(upload_file_path, model.to_text(), newline="")
+
+        async def upload(sftp):
+            if await FileManager._stat(server, choose, sftp) != expected_stat:
+                raise FileConflictError(f"{server}: {config[choose]} changed remotely")
+            await FileManager._transfer_file(server, choose, "put", sftp, upload_file_path)
+            return await FileManager._stat(server, choose, sftp)
+
+        entry.putting = True
+        try:
+            stat = await FileManager._run(server, upload)
+            # After any refresh that started before the upload finished
+            async with entry.refreshing:
+                os.replace(upload_file_path, local_file_path)
+                model.modified = False
+                entry.model = model
+                entry.stat = stat
+                entry.checked_at = time.monotonic()
+                FileManager._notify(server, choose, model)
+        except BaseException:
+            try:
+                os.remove(upload_file_path)
+            except OSError:
+                pass
+            raise
+        finally:
+            entry.putting = False
+
+    @staticmethod
+    def _notify(server, choose, model) -> None:
+        """Passes every newly cached model to the listeners (e.g. UserIndex)."""
+        for listener in FileManager.listeners:
+            listener(server, choose, model)
+
+    @staticmethod
+    def lock(server, choose) -> asyncio.Lock:
+        return FileManager.locks.setdefault((server, choose), asyncio.Lock())
+
+    @staticmethod
+    async def modify(server, choose, edit):
+        """
+        Runs edit(model) on a fresh copy of the file's model and uploads it
+        if the edit changed it. Edits of the same file on the same server
+        are serialized, and if the remote file was changed by someone else
+        meanwhile, the edit is retried on the new content.
+        Returns whatever edit returned.
+        """
+        async with FileManager.lock(server, choose):
+            for attempt in range(FileManager.max_conflict_retries + 1):
+                cached_model = await FileManager.load(server, choose)
+                expected_stat = FileManager.cache[(server, choose)].stat
+                with Metrics.span("edit", server):
+                    model = cached_model.copy()
+                    result = edit(model)
+                if not model.modified:
+                    return result
+                try:
+                    await FileManager.put(server, choose, model, expected_stat)
+                    return result
+                except FileConflictError:
+                    if attempt == FileManager.max_conflict_retries:
+                        raise
+
+    @staticmethod
+    async def load_many(server, chooses, max_staleness=0, stale_on_error=False) -> list:
+        """
+        Returns the parsed models of several files of one server.
+        Within max_staleness seconds of the last check a cached model is
+        served without contacting the server, the rest are checked
+        concurrently over one SFTP session, and a file is downloaded and
+        parsed again only if its remote stat changed.
+        With stale_on_error, the cached models are returned when the server
+        is unavailable, is_available() tells the caller they may be stale.
+        Commands that modify a file should use max_staleness=0.
+        """
+        entries = [
+            FileManager.cache.setdefault((server, choose), CachedFile())
+            for choose in chooses
+        ]
+
+        def stale():
+            return [
+                choose for choose, entry in zip(chooses, entries)
+                if entry.model is None or entry.age() > max_staleness
+            ]
+
+        if not stale():
+            return [entry.model for entry in entries]
+
+        async with contextlib.AsyncExitStack() as stack:
+            # Taken in one order before a connection is checked out, so
+            # concurrent loads neither deadlock nor wait on the read timeout
+            for choose in sorted(stale()):
+                await stack.enter_async_context(
+                    FileManager.cache[(server, choose)].refreshing
+                )
+            # Another load may have refreshed the files meanwhile
+            chooses_to_refresh = stale()
+            if chooses_to_refresh:
+                try:
+                    await FileManager._run(server, lambda sftp: asyncio.gather(*(
+                        FileManager._refresh(server, choose, sftp)
+                        for choose in chooses_to_refresh
+                    )))
+                except (asyncssh.Error, OSError, asyncio.TimeoutError):
+                    if not stale_on_error or any(entry.model is None for entry in entries):
+                        raise
+        return [entry.model for entry in entries]
+
+    @staticmethod
+    def cached(server, choose):
+        """Returns the cached model without any network I/O, or None."""
+        entry = FileManager.cache.get((server, choose))
+        return entry.model if entry else None
+
+    @staticmethod
+    def read_staleness() -> float:
+        """
+        How old a cached file read-only commands may use: max_staleness,
+        or longer while the background sync keeps the files mirrored.
+        """
+        return max(FileManager.max_staleness, FileManager.mirror_staleness)
+
+    @staticmethod
+    def age(server, chooses) -> float | None:
+        """Seconds since the oldest of the files was last checked."""
+        entries = [FileManager.cache.get((server, choose)) for choose in chooses]
+        if any(entry is None or entry.model is None for entry in entries):
+            return None
+        return max(entry.age() for entry in entries)
+
+    @staticmethod
+    async def load(server, choose, max_staleness=0, stale_on_error=False):
+        models = await FileManager.load_many(
+            server, [choose], max_staleness, stale_on_error
+        )
+        return models[0]
+
+    @staticmethod
+    async def read(filename, newline=None) -> str:
+        async with aiofiles.open(
+                filename, "r", encoding="utf-8", newline=newline
+        ) as file:
             return await file.read()
 
     @staticmethod
-    async def write(filename, content) -> None:
-        async with aiofiles.open(filename, "w", encoding="utf-8") as file:
+    async def write(filename, content, newline=None) -> None:
+        async with aiofiles.open(
+                filename, "w", encoding="utf-8", newline=newline
+        ) as file:
             await file.write(content)
+
+    @staticmethod
+    async def close() -> None:
+        await pool.close_all()
@@ -0,0 +1,74 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+from datetime import datetime
+
+from utils.config import config
+from utils.time import Time
+
+log_config = config.get("logging", {})
+
+# Extra fields a log call may pass, e.g. logger.info(..., extra={"server": server})
+FIELDS = ("command", "user", "server", "latency", "outcome", "error")
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line: time, level, message and the extra fields."""
+    def format(self, record) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, Time.timezone)
+            .isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "message": record.getMessage(),
+        }
+        for field in FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class ConsoleFormatter(logging.Formatter):
+    def format(self, record) -> str:
+        time = datetime.fromtimestamp(record.created, Time.timezone)
+        return f"[{time.strftime('%H:%M:%S %d.%m.%Y')}] {record.getMessage()}"
+
+
+def setup_logger() -> tuple[logging.Logger, logging.handlers.QueueListener]:
+    """
+    Log calls only put the record on a queue, a background thread formats
+    it and writes it to a size-rotated JSON lines file and the console,
+    so a slow disk or terminal never blocks the event loop.
+    """
+    handlers = []
+    if log_config.get("path", "bot.log"):
+        file_handler = logging.handlers.RotatingFileHandler(
+            log_config.get("path", "bot.log"),
+            maxBytes=log_config.get("max_bytes", 10 * 1024 * 1024),
+            backupCount=log_config.get("backup_count", 5),
+            encoding="utf-8"
+        )
+        file_handler.setFormatter(JSONFormatter())
+        handlers.append(file_handler)
+    if log_config.get("console", True):
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(ConsoleFormatter())
+        handlers.append(console_handler)
+
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(
+        log_queue, *handlers, respect_handler_level=True
+    )
+    listener.start()
+    atexit.register(listener.stop)
+
+    bot_logger = logging.getLogger("scp_bot")
+    bot_logger.setLevel(log_config.get("level", "INFO"))
+    bot_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    bot_logger.propagate = False
+    return bot_logger, listener
+
+
+logger, log_listener = setup_logger()
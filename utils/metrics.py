@@ -0,0 +1,148 @@
+import bisect
+import contextvars
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from aiohttp import web
+
+current_command = contextvars.ContextVar("current_command", default="-")
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+# Raw samples kept per series for percentiles in /метрики
+SAMPLES = 1000
+
+
+class Histogram:
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+        self.samples = deque(maxlen=SAMPLES)
+
+    def observe(self, seconds: float) -> None:
+        index = bisect.bisect_left(BUCKETS, seconds)
+        if index < len(BUCKETS):
+            self.buckets[index] += 1
+        self.count += 1
+        self.sum += seconds
+        self.samples.append(seconds)
+
+
+def percentile(samples, fraction: float) -> float:
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+def _labels(labels: dict) -> str:
+    return "{" + ",".join(
+        f'{key}="{_escape(value)}"' for key, value in labels.items()
+    ) + "}"
+
+
+class Metrics:
+    """
+    In-process latency histograms per (stage, command, server) and event
+    counters, exported in the Prometheus text format. The command label
+    comes from current_command, which is set before every slash command.
+    """
+    histograms: dict[tuple, Histogram] = {}
+    counters: dict[str, dict[tuple, int]] = {}
+    _runner: web.AppRunner | None = None
+
+    @staticmethod
+    def observe(stage: str, seconds: float, server: str = "-") -> None:
+        key = (stage, current_command.get(), server)
+        Metrics.histograms.setdefault(key, Histogram()).observe(seconds)
+
+    @staticmethod
+    def increment(name: str, **labels) -> None:
+        labels = {"command": current_command.get(), **labels}
+        series = Metrics.counters.setdefault(name, {})
+        key = tuple(sorted(labels.items()))
+        series[key] = series.get(key, 0) + 1
+
+    @staticmethod
+    @contextmanager
+    def span(stage: str, server: str = "-"):
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception as error:
+            Metrics.increment(
+                "errors_total", stage=stage, server=server,
+                error=type(error).__name__
+            )
+            raise
+        finally:
+            Metrics.observe(stage, time.perf_counter() - started, server)
+
+    @staticmethod
+    def render() -> str:
+        lines = [
+            "# HELP scp_bot_stage_seconds Latency of command stages",
+            "# TYPE scp_bot_stage_seconds histogram",
+        ]
+        for (stage, command, server), histogram in Metrics.histograms.items():
+            labels = {"stage": stage, "command": command, "server": server}
+            cumulative = 0
+            for bound, count in zip(BUCKETS, histogram.buckets):
+                cumulative += count
+                lines.append(
+                    f"scp_bot_stage_seconds_bucket"
+                    f"{_labels({**labels, 'le': bound})} {cumulative}"
+                )
+            lines.append(
+                f"scp_bot_stage_seconds_bucket"
+                f"{_labels({**labels, 'le': '+Inf'})} {histogram.count}"
+            )
+            lines.append(f"scp_bot_stage_seconds_sum{_labels(labels)} {histogram.sum}")
+            lines.append(f"scp_bot_stage_seconds_count{_labels(labels)} {histogram.count}")
+
+        for name, series in Metrics.counters.items():
+            lines.append(f"# TYPE scp_bot_{name} counter")
+            for key, value in series.items():
+                lines.append(f"scp_bot_{name}{_labels(dict(key))} {value}")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def summary(group_by: str = "stage") -> list[tuple]:
+        """
+        Returns [(name, count, p50, p95, p99)] over the recent samples,
+        grouped by "stage", "command" or "server".
+        """
+        position = ("stage", "command", "server").index(group_by)
+        grouped: dict[str, tuple[int, list]] = {}
+        for key, histogram in Metrics.histograms.items():
+            count, samples = grouped.get(key[position], (0, []))
+            samples.extend(histogram.samples)
+            grouped[key[position]] = (count + histogram.count, samples)
+        return sorted(
+            (
+                name, count, percentile(samples, 0.5),
+                percentile(samples, 0.95), percentile(samples, 0.99)
+            )
+            for name, (count, samples) in grouped.items()
+        )
+
+    @staticmethod
+    async def start_server(host: str, port: int) -> None:
+        if Metrics._runner is not None:
+            return
+
+        async def handle(request):
+            return web.Response(
+                text=Metrics.render(), content_type="text/plain", charset="utf-8"
+            )
+
+        app = web.Application()
+        app.router.add_get("/metrics", handle)
+        Metrics._runner = web.AppRunner(app, access_log=None)
+        await Metrics._runner.setup()
+        await web.TCPSite(Metrics._runner, host, port).start()
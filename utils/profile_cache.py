@@ -0,0 +1,138 @@
+import asyncio
+import sqlite3
+import time
+from collections import OrderedDict
+
+
+class ProfileCache:
+    """
+    TTL + LRU cache of Steam profiles {steamid: (name, avatar)}.
+    Concurrent lookups of the same SteamID share one in-flight fetch.
+    If persist_path is set, entries are also stored in SQLite,
+    so the cache is not cold after a restart.
+    """
+    def __init__(
+            self,
+            ttl: float = 3600,
+            max_size: int = 5000,
+            persist_path: str | None = None
+    ):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict[str, tuple[float, tuple]] = OrderedDict()
+        self._in_flight: dict[str, asyncio.Future] = {}
+        self._pending: list[tuple] = []
+        self._db_lock = asyncio.Lock()
+        self._db = None
+        if persist_path:
+            self._open(persist_path)
+
+    def _open(self, persist_path: str) -> None:
+        self._db = sqlite3.connect(persist_path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS profiles ("
+            "steamid TEXT PRIMARY KEY, name TEXT, avatar TEXT, fetched_at REAL)"
+        )
+        self._db.execute(
+            "DELETE FROM profiles WHERE fetched_at < ?",
+            (time.time() - self.ttl,)
+        )
+        self._db.commit()
+        rows = self._db.execute(
+            "SELECT steamid, name, avatar, fetched_at FROM profiles "
+            "ORDER BY fetched_at DESC LIMIT ?",
+            (self.max_size,)
+        ).fetchall()
+        for steamid, name, avatar, fetched_at in reversed(rows):
+            self._entries[steamid] = (fetched_at, (name, avatar))
+
+    def get(self, steamid: str) -> tuple | None:
+        entry = self._entries.get(steamid)
+        if entry is None:
+            self.misses += 1
+            return None
+        fetched_at, profile = entry
+        if time.time() - fetched_at > self.ttl:
+            del self._entries[steamid]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(steamid)
+        self.hits += 1
+        return profile
+
+    def put(self, steamid: str, profile: tuple) -> None:
+        fetched_at = time.time()
+        self._entries[steamid] = (fetched_at, profile)
+        self._entries.move_to_end(steamid)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        if self._db is not None:
+            self._pending.append((steamid, *profile, fetched_at))
+
+    async def get_many(self, steamids, fetch) -> dict:
+        """
+        Returns {steamid: profile or None}. Cached ids are served
+        from memory, ids already being fetched by another caller are
+        awaited, and the rest are passed to fetch(steamids) at once.
+        """
+        result = {}
+        waiting = {}
+        missing = []
+        for steamid in dict.fromkeys(steamids):
+            profile = self.get(steamid)
+            if profile is not None:
+                result[steamid] = profile
+            elif steamid in self._in_flight:
+                waiting[steamid] = self._in_flight[steamid]
+            else:
+                missing.append(steamid)
+
+        if missing:
+            loop = asyncio.get_running_loop()
+            futures = {steamid: loop.create_future() for steamid in missing}
+            self._in_flight.update(futures)
+            try:
+                fetched = await fetch(missing)
+                for steamid in missing:
+                    profile = fetched.get(steamid)
+                    if profile is not None:
+                        self.put(steamid, profile)
+                    result[steamid] = profile
+            finally:
+                for steamid, future in futures.items():
+                    self._in_flight.pop(steamid, None)
+                    if not future.done():
+                        future.set_result(result.get(steamid))
+            await self.flush()
+
+        for steamid, future in waiting.items():
+            result[steamid] = await future
+        return result
+
+    async def flush(self) -> None:
+        if self._db is None or not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        async with self._db_lock:
+            await asyncio.to_thread(self._write, pending)
+
+    def _write(self, rows: list[tuple]) -> None:
+        self._db.executemany(
+            "INSERT OR REPLACE INTO profiles "
+            "(steamid, name, avatar, fetched_at) VALUES (?, ?, ?, ?)",
+            rows
+        )
+        self._db.commit()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "in_flight": len(self._in_flight)
+        }
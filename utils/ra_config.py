@@ -0,0 +1,178 @@
+import copy
+import re
+
+MEMBER_PATTERN = re.compile(r"^(\s*-\s*)(\d+)@steam:(\s*)([^\s#]+)")
+ROLE_PATTERN = re.compile(r"^\s*-\s*([^\s#:]+)")
+
+
+class RAConfig:
+    """
+    Parsed config_remoteadmin.txt. The Members and Roles sections
+    are indexed for O(1) lookups, while the original lines (comments,
+    indentation, line endings) are kept, so to_text() gives back
+    the file exactly as it was, apart from the edited lines.
+
+    Membership changes only update the index and are written to the
+    lines in one pass by to_text(), so any number of edits costs
+    O(file + edits) rather than a pass over the file per edit.
+    """
+    def __init__(self, text: str):
+        self.lines = text.splitlines(keepends=True)
+        self.newline = "\r\n" if text.count("\r\n") > text.count("\n") // 2 else "\n"
+        self.modified = False
+        # {steamid: new role or None} not yet written to the lines
+        self.pending: dict[str, str | None] = {}
+        # {steamid: role before the first change}, for diff()
+        self.original: dict[str, str | None] = {}
+        self._parse()
+
+    def _parse(self) -> None:
+        self.members: dict[str, str] = {}
+        self.member_lines: dict[str, list[int]] = {}
+        self.roles: list[str] = []
+        self.role_set: set[str] = set()
+        self.members_header: int | None = None
+        self.roles_header: int | None = None
+
+        section = None
+        for index, line in enumerate(self.lines):
+            stripped = line.strip()
+            if stripped == "Members:":
+                section = "members"
+                self.members_header = index
+                continue
+            if stripped == "Roles:":
+                section = "roles"
+                self.roles_header = index
+                continue
+            if not stripped or stripped.startswith("#"):
+                continue
+            if not stripped.startswith("-"):
+                section = None
+                continue
+
+            if section == "members":
+                match = MEMBER_PATTERN.match(line)
+                if match:
+                    # Every occurrence is kept, so an edit never leaves a stale duplicate
+                    self.member_lines.setdefault(match.group(2), []).append(index)
+                    self.members.setdefault(match.group(2), match.group(4))
+            elif section == "roles":
+                match = ROLE_PATTERN.match(line)
+                if match and match.group(1) not in self.role_set:
+                    self.roles.append(match.group(1))
+                    self.role_set.add(match.group(1))
+
+    def copy(self) -> "RAConfig":
+        """An independent copy to edit, without parsing the file again."""
+        self._flush()
+        clone = copy.copy(self)
+        clone.lines = list(self.lines)
+        clone.members = dict(self.members)
+        clone.member_lines = dict(self.member_lines)
+        clone.pending = {}
+        clone.original = {}
+        clone.modified = False
+        return clone
+
+    def get_role(self, steamid: str) -> str | None:
+        return self.members.get(steamid)
+
+    def contains_role(self, role: str) -> bool:
+        return role in self.role_set
+
+    def format_roles(self) -> str:
+        return "\n".join(f" - {role}" for role in self.roles)
+
+    def _change(self, steamid: str, role: str | None) -> None:
+        self.original.setdefault(steamid, self.members.get(steamid))
+        if role is None:
+            del self.members[steamid]
+        else:
+            self.members[steamid] = role
+        self.pending[steamid] = role
+        self.modified = True
+
+    def set_role(self, steamid: str, role: str) -> None:
+        if self.members.get(steamid) != role:
+            self._change(steamid, role)
+
+    def remove_member(self, steamid: str) -> None:
+        if steamid in self.members:
+            self._change(steamid, None)
+
+    def apply(self, changes: dict[str, str | None]) -> list[str]:
+        """
+        Applies {steamid: role, or None to remove the member}
+        and returns the diff() of all changes so far.
+        """
+        for steamid, role in changes.items():
+            if role is None:
+                self.remove_member(steamid)
+            else:
+                self.set_role(steamid, role)
+        return self.diff()
+
+    def changes(self) -> list[tuple]:
+        """[(steamid, old role, new role)] since parsing, None for no role."""
+        return [
+            (steamid, old_role, self.members.get(steamid))
+            for steamid, old_role in self.original.items()
+            if old_role != self.members.get(steamid)
+        ]
+
+    def diff(self) -> list[str]:
+        """Changed member lines as "- <steamid>@steam: <old>" / "+ ...: <new>"."""
+        lines = []
+        for steamid, old_role, new_role in self.changes():
+            if old_role:
+                lines.append(f"- {steamid}@steam: {old_role}")
+            if new_role:
+                lines.append(f"+ {steamid}@steam: {new_role}")
+        return lines
+
+    def _flush(self) -> None:
+        """
+        Writes the pending changes in a single pass: changed member lines
+        are edited in place or dropped, new members are inserted right
+        after the Members header, every other line is copied as it is.
+        """
+        if not self.pending:
+            return
+        changed_lines = {
+            index: steamid
+            for steamid in self.pending
+            for index in self.member_lines.get(steamid, ())
+        }
+        new_members = [
+            f" - {steamid}@steam: {role}{self.newline}"
+            for steamid, role in self.pending.items()
+            if role is not None and steamid not in self.member_lines
+        ]
+
+        lines = []
+        for index, line in enumerate(self.lines):
+            steamid = changed_lines.get(index)
+            if steamid is None:
+                lines.append(line)
+            elif self.pending[steamid] is not None:
+                match = MEMBER_PATTERN.match(line)
+                lines.append(line[:match.start(4)] + self.pending[steamid] + line[match.end(4):])
+            if index == self.members_header and new_members:
+                if not lines[-1].endswith(("\n", "\r")):
+                    lines[-1] += self.newline
+                lines.extend(new_members)
+
+        if self.members_header is None and new_members:
+            if lines and not lines[-1].endswith(("\n", "\r")):
+                lines[-1] += self.newline
+            lines.append(f"Members:{self.newline}")
+            lines.extend(new_members)
+
+        self.lines = lines
+        self.pending.clear()
+        self._parse()
+
+    def to_text(self) -> str:
+        self._flush()
+        return "".join(self.lines)
@@ -0,0 +1,58 @@
+from utils.ra_config import RAConfig
+
+
+class Replication:
+    """
+    Makes a target server's file hold the same members as the source's.
+    plan() gives the minimal changes for model.apply(), so a target that
+    is already in sync gets no changes and is not uploaded at all.
+    """
+    @staticmethod
+    def plan(source, target, prohibited_roles=()) -> tuple[dict, list[str]]:
+        """
+        Returns (changes, skipped): changes in the format of target.apply(),
+        and the SteamIDs left as they are, because the role is missing
+        on the target server or may only be changed manually.
+        """
+        if isinstance(source, RAConfig):
+            return Replication._plan_roles(source, target, prohibited_roles)
+
+        changes = {
+            steamid: True for steamid in source.steamids() if steamid not in target
+        }
+        changes.update(
+            (steamid, False) for steamid in target.steamids() if steamid not in source
+        )
+        return changes, []
+
+    @staticmethod
+    def _plan_roles(source, target, prohibited_roles) -> tuple[dict, list[str]]:
+        changes = {}
+        skipped = []
+        for steamid, role in source.members.items():
+            old_role = target.get_role(steamid)
+            if old_role == role:
+                continue
+            if (
+                    role in prohibited_roles
+                    or old_role in prohibited_roles
+                    or not target.contains_role(role)
+            ):
+                skipped.append(steamid)
+                continue
+            changes[steamid] = role
+
+        for steamid, role in target.members.items():
+            if steamid in source.members:
+                continue
+            if role in prohibited_roles:
+                skipped.append(steamid)
+                continue
+            changes[steamid] = None
+        return changes, skipped
+
+    @staticmethod
+    def preview(source, target, prohibited_roles=()) -> tuple[list[str], list[str]]:
+        """(diff, skipped) that replicating would give, without changing target."""
+        changes, skipped = Replication.plan(source, target, prohibited_roles)
+        return target.copy().apply(changes), skipped
@@ -1,8 +1,14 @@
+import asyncio
+
 import disnake
 
+from utils.metrics import Metrics
 from utils.time import Time
 
 
+PAGE_LIMIT = 4000
+
+
 class Response:
     @staticmethod
     async def send(
@@ -30,14 +36,16 @@ class Response:
                 icon_url=interaction.user.avatar
             )
 
-        await interaction.send(embed=response)
+        with Metrics.span("discord"):
+            await interaction.send(embed=response)
 
     @staticmethod
     async def send_silent(interaction, message):
         ephemeral_response = disnake.Embed(
             description=message, color=0xFFFFFF
         )
-        await interaction.send(embed=ephemeral_response)
+        with Metrics.span("discord"):
+            await interaction.send(embed=ephemeral_response)
         await interaction.delete_original_response(delay=10)
 
     @staticmethod
@@ -45,9 +53,10 @@ class Response:
         ephemeral_response = disnake.Embed(
             description=message, color=0xFFFFFF
         )
-        await interaction.send(
-            embed=ephemeral_response, ephemeral=True
-        )
+        with Metrics.span("discord"):
+            await interaction.send(
+                embed=ephemeral_response, ephemeral=True
+            )
 
     @staticmethod
     async def edit(interaction, message, thumbnail = None) -> None:
@@ -58,6 +67,112 @@ class Response:
         if thumbnail:
             new_response.set_thumbnail(url=thumbnail)
 
-        await interaction.edit_original_response(
-            embed=new_response
-        )
+        with Metrics.span("discord"):
+            await interaction.edit_original_response(
+                embed=new_response
+            )
+
+    @staticmethod
+    def split_pages(header, lines, limit=PAGE_LIMIT) -> list[str]:
+        pages = []
+        page = header
+        for line in lines:
+            if len(page) + len(line) > limit and page != header:
+                pages.append(page)
+                page = header
+            page += line
+        pages.append(page)
+        return pages
+
+    @staticmethod
+    async def edit_pages(interaction, header, lines) -> None:
+        pages = Response.split_pages(header, lines)
+        if len(pages) == 1:
+            await Response.edit(interaction, pages[0])
+            return
+
+        async def render(index):
+            return pages[index]
+
+        await Response.edit_paginated(interaction, render, len(pages))
+
+    @staticmethod
+    async def edit_paginated(interaction, render, page_count) -> None:
+        """
+        Shows pages produced by render(index) with button navigation.
+        Pages are rendered only when needed, and the next page
+        is prefetched in the background while the current one is shown.
+        """
+        paginator = Paginator(render, page_count, interaction.author.id)
+        embed = await paginator.embed()
+        with Metrics.span("discord"):
+            if page_count > 1:
+                await interaction.edit_original_response(embed=embed, view=paginator)
+            else:
+                await interaction.edit_original_response(embed=embed)
+
+
+class Paginator(disnake.ui.View):
+    def __init__(
+            self,
+            render,
+            page_count: int,
+            author_id: int,
+            timeout: float = 300
+    ):
+        super().__init__(timeout=timeout)
+        self.render = render
+        self.page_count = page_count
+        self.author_id = author_id
+        self.index = 0
+        self._pages: dict[int, asyncio.Task] = {}
+        self._update_buttons()
+
+    def _update_buttons(self) -> None:
+        self.previous_page.disabled = self.index == 0
+        self.next_page.disabled = self.index >= self.page_count - 1
+
+    def _page(self, index: int) -> asyncio.Task:
+        if index not in self._pages:
+            self._pages[index] = asyncio.create_task(self.render(index))
+        return self._pages[index]
+
+    def prefetch(self, index: int) -> None:
+        if 0 <= index < self.page_count:
+            self._page(index)
+
+    async def embed(self) -> disnake.Embed:
+        text = await self._page(self.index)
+        self.prefetch(self.index + 1)
+        embed = disnake.Embed(description=text, color=0xFFFFFF)
+        if self.page_count > 1:
+            embed.set_footer(text=f"Сторінка {self.index + 1}/{self.page_count}")
+        return embed
+
+    async def interaction_check(self, interaction) -> bool:
+        return interaction.author.id == self.author_id
+
+    async def on_timeout(self) -> None:
+        for task in self._pages.values():
+            task.cancel()
+
+    async def _show(self, interaction, index: int) -> None:
+        self.index = index
+        self._update_buttons()
+        if self._page(index).done():
+            await interaction.response.edit_message(
+                embed=await self.embed(), view=self
+            )
+        else:
+            await interaction.response.defer()
+            await interaction.edit_original_response(
+                embed=await self.embed(), view=self
+            )
+
+    @disnake.ui.button(label="◀", style=disnake.ButtonStyle.secondary)
+    async def previous_page(self, button, interaction) -> None:
+        await self._show(interaction, self.index - 1)
+
+    @disnake.ui.button(label="▶", style=disnake.ButtonStyle.secondary)
+    async def next_page(self, button, interaction) -> None:
+        await self._show(interaction, self.index + 1)
@@ -0,0 +1,250 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+import asyncssh
+from asyncssh import SFTPClient, SSHClientConnection
+
+from utils.metrics import Metrics
+
+
+class PooledConnection:
+    def __init__(self, ssh_client: SSHClientConnection, sftp: SFTPClient, on_close=None):
+        self.ssh_client = ssh_client
+        self.sftp = sftp
+        self.last_used = time.monotonic()
+        self.closed = False
+        # Called once, when the connection is closed or aborted
+        self._on_close = on_close
+
+    def _mark_closed(self) -> None:
+        if not self.closed:
+            self.closed = True
+            if self._on_close:
+                self._on_close()
+
+    def is_alive(self) -> bool:
+        return not self.ssh_client.is_closed()
+
+    def idle_for(self) -> float:
+        return time.monotonic() - self.last_used
+
+    def abort(self) -> None:
+        """Drops the connection at once, without waiting for the server."""
+        self._mark_closed()
+        self.sftp.exit()
+        self.ssh_client.abort()
+
+    async def close(self) -> None:
+        self._mark_closed()
+        self.sftp.exit()
+        self.ssh_client.close()
+        try:
+            await self.ssh_client.wait_closed()
+        except (asyncssh.Error, OSError):
+            pass
+
+
+class SSHPool:
+    """
+    Keeps authenticated SSH connections with an open SFTP client
+    per (host, port, username), so the handshake is paid once per server.
+    At most max_per_host connections to one (host, port) are open at
+    once, however many servers (usernames) share that address: to connect
+    as another username at the cap, its least recently used idle
+    connection is closed first.
+    Connections that were idle for longer than health_check_after are
+    probed before reuse, broken ones are replaced, and connections idle
+    for longer than idle_timeout are closed by a background reaper.
+    Connecting and probing give up after connect_timeout seconds.
+    """
+    def __init__(
+            self,
+            max_per_host: int = 4,
+            idle_timeout: float = 300,
+            health_check_after: float = 30,
+            connect_timeout: float = 5
+    ):
+        self.max_per_host = max_per_host
+        self.idle_timeout = idle_timeout
+        self.health_check_after = health_check_after
+        self.connect_timeout = connect_timeout
+        self._idle: dict[tuple, list[PooledConnection]] = {}
+        self._limits: dict[tuple, asyncio.Semaphore] = {}
+        # Open (or being opened) connections per (host, port)
+        self._open: dict[tuple, int] = {}
+        self._reaper: asyncio.Task | None = None
+
+    async def run(self, host, port, username, password, operation, timeout: float):
+        """
+        Runs operation(sftp) on a pooled connection and gives up after
+        timeout seconds, counted from the checkout, so waiting for a free
+        connection is not included. A cancelled asyncssh transfer still
+        waits for the replies to its outstanding requests, which a hung
+        server never sends, so instead of cancelling the operation the
+        connection is aborted, which fails those requests at once.
+        """
+        async with self._lease(host, port, username, password) as connection:
+            task = asyncio.ensure_future(operation(connection.sftp))
+            try:
+                done, _ = await asyncio.wait({task}, timeout=timeout)
+            except BaseException:
+                connection.abort()
+                self._forget(task)
+                raise
+            if not done:
+                connection.abort()
+                # Let the operation clean up after the failed requests
+                await asyncio.wait({task}, timeout=self.connect_timeout)
+                self._forget(task)
+                raise asyncio.TimeoutError(f"no answer within {timeout} s")
+            return task.result()
+
+    @staticmethod
+    def _forget(task: asyncio.Task) -> None:
+        """Silences the outcome of an operation that is not awaited any more."""
+        task.add_done_callback(lambda done: done.cancelled() or done.exception())
+
+    @asynccontextmanager
+    async def _lease(self, host, port, username, password):
+        key = (host, port, username)
+        self._start_reaper()
+        limit = self._limits.setdefault(
+            (host, port), asyncio.Semaphore(self.max_per_host)
+        )
+        async with limit:
+            connection = await self._checkout(key, password)
+            try:
+                yield connection
+            except asyncssh.SFTPError:
+                self._checkin(key, connection)
+                raise
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                # A request cut off by a timeout leaves the connection
+                # possibly hung, so it is dropped without waiting for it
+                connection.abort()
+                raise
+            except (asyncssh.Error, OSError):
+                await connection.close()
+                raise
+            except BaseException:
+                self._checkin(key, connection)
+                raise
+            else:
+                self._checkin(key, connection)
+
+    async def _checkout(self, key, password) -> PooledConnection:
+        idle = self._idle.setdefault(key, [])
+        while idle:
+            connection = idle.pop()
+            try:
+                healthy = await self._is_healthy(connection)
+            except asyncio.CancelledError:
+                connection.abort()
+                raise
+            if healthy:
+                return connection
+            await connection.close()
+        await self._make_room(key[:2])
+        return await self._connect(key, password)
+
+    async def _make_room(self, host_key) -> None:
+        """
+        Closes idle connections of other usernames on the host while it is
+        at the cap. The caller holds one of the host's max_per_host slots,
+        so at the cap at least one open connection is idle.
+        """
+        while self._open.get(host_key, 0) >= self.max_per_host:
+            idle = [
+                (connection.last_used, key, connection)
+                for key, connections in self._idle.items() if key[:2] == host_key
+                for connection in connections
+            ]
+            if not idle:
+                return
+            _, key, connection = min(idle, key=lambda item: item[0])
+            self._idle[key].remove(connection)
+            await connection.close()
+
+    def _checkin(self, key, connection: PooledConnection) -> None:
+        if not connection.is_alive():
+            connection.abort()
+            return
+        connection.last_used = time.monotonic()
+        self._idle.setdefault(key, []).append(connection)
+
+    async def _is_healthy(self, connection: PooledConnection) -> bool:
+        if not connection.is_alive():
+            return False
+        if connection.idle_for() < self.health_check_after:
+            return True
+        try:
+            await asyncio.wait_for(
+                connection.sftp.realpath("."), self.connect_timeout
+            )
+        except (asyncssh.Error, OSError, asyncio.TimeoutError):
+            return False
+        return True
+
+    async def _connect(self, key, password) -> PooledConnection:
+        host, port, username = key
+        host_key = (host, port)
+
+        def closed():
+            self._open[host_key] -= 1
+
+        # Counted from the start, so concurrent connects cannot exceed the cap
+        self._open[host_key] = self._open.get(host_key, 0) + 1
+        try:
+            with Metrics.span("ssh_connect", username):
+                ssh_client = await asyncssh.connect(
+                    host,
+                    port=port,
+                    username=username,
+                    password=password,
+                    known_hosts=None,
+                    connect_timeout=self.connect_timeout
+                )
+                try:
+                    sftp = await asyncio.wait_for(
+                        ssh_client.start_sftp_client(), self.connect_timeout
+                    )
+                except BaseException:
+                    ssh_client.close()
+                    raise
+        except BaseException:
+            closed()
+            raise
+        return PooledConnection(ssh_client, sftp, on_close=closed)
+
+    def _start_reaper(self) -> None:
+        if self._reaper is None or self._reaper.done():
+            self._reaper = asyncio.get_running_loop().create_task(self._reap())
+
+    async def _reap(self) -> None:
+        while True:
+            await asyncio.sleep(self.idle_timeout / 2)
+            await self.evict_idle()
+
+    async def evict_idle(self) -> None:
+        for key, idle in list(self._idle.items()):
+            expired = [
+                connection for connection in idle
+                if connection.idle_for() >= self.idle_timeout
+                or not connection.is_alive()
+            ]
+            self._idle[key] = [
+                connection for connection in idle
+                if connection not in expired
+            ]
+            for connection in expired:
+                await connection.close()
+
+    async def close_all(self) -> None:
+        if self._reaper:
+            self._reaper.cancel()
+            self._reaper = None
+        idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for connection in connections:
+                await connection.close()
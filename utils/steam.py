@@ -1,65 +1,188 @@
 import asyncio
 import aiohttp
-import json
+import random
 import re
+import time
+from email.utils import parsedate_to_datetime
 
-from utils.time import Time
+from utils.config import config
+from utils.metrics import Metrics, current_command
+from utils.profile_cache import ProfileCache
+from utils.rate_limiter import TokenBucket
+from utils.log import logger
 
 
-def load_api_key() -> str:
-    with open("./config.json", "r") as config_file:
-        config_data = json.load(config_file)
-        return config_data.get("steam_api_key", "")
+cache_config = config.get("steam_cache", {})
+rate_limit_config = config.get("steam_rate_limit", {})
 
 
 class SteamAPI:
-    steam_api_key = load_api_key()
+    steam_api_key = config.get("steam_api_key", "")
+    api_url = config.get("steam_api_url", "https://api.steampowered.com")
+    cache = ProfileCache(
+        ttl=cache_config.get("ttl", 3600),
+        max_size=cache_config.get("max_size", 5000),
+        persist_path=cache_config.get("persist_path")
+    )
+    max_ids_per_request = 100
+    max_concurrent_requests = 4
+    max_retries = rate_limit_config.get("max_retries", 5)
+    base_backoff = 0.5
+    max_backoff = 30
+    rate_limiter = TokenBucket(
+        rate=rate_limit_config.get("rate", 4),
+        capacity=rate_limit_config.get("burst", 10)
+    )
+    session: aiohttp.ClientSession | None = None
 
     @staticmethod
-    async def get_url(steamid: str) -> str:
+    async def get_url(steamids: str) -> str:
         return (
-            f"https://api.steampowered.com/"
+            f"{SteamAPI.api_url}/"
             f"ISteamUser/GetPlayerSummaries/"
-            f"v0002/?key={SteamAPI.steam_api_key}&steamids={steamid}"
+            f"v0002/?key={SteamAPI.steam_api_key}&steamids={steamids}"
         )
 
     @staticmethod
-    async def fetch_data(url: str, repetition: int = 0) -> dict:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url) as response:
-                if response.status == 200:
-                    return await response.json()
-                elif response.status == 429 and repetition < 5:
-                    await asyncio.sleep(1)
-                    repetition += 1
-                    return await SteamAPI.fetch_data(url, repetition)
-                else:
-                    print(
-                        f"[{await Time.get_normalised()}] "
-                        f"Error SteamAPI: {response.status}"
-                    )
-                    return {}
+    async def get_session() -> aiohttp.ClientSession:
+        if SteamAPI.session is None or SteamAPI.session.closed:
+            SteamAPI.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=SteamAPI.max_concurrent_requests,
+                    keepalive_timeout=60,
+                    ttl_dns_cache=300
+                ),
+                timeout=aiohttp.ClientTimeout(total=10)
+            )
+        return SteamAPI.session
+
+    @staticmethod
+    async def close() -> None:
+        if SteamAPI.session is not None:
+            await SteamAPI.session.close()
+            SteamAPI.session = None
+
+    @staticmethod
+    def get_retry_delay(retry_after: str | None, attempt: int) -> float | None:
+        """
+        Exponential backoff with full jitter,
+        never shorter than the Retry-After header asks for.
+        Returns None if Retry-After asks for more than max_backoff,
+        the request is given up then rather than stalling every caller.
+        """
+        delay = random.uniform(0, min(
+            SteamAPI.max_backoff, SteamAPI.base_backoff * 2 ** attempt
+        ))
+        if retry_after:
+            try:
+                requested = float(retry_after)
+            except ValueError:
+                try:
+                    retry_at = parsedate_to_datetime(retry_after)
+                    requested = retry_at.timestamp() - time.time()
+                except (TypeError, ValueError):
+                    requested = 0
+            if requested > SteamAPI.max_backoff:
+                return None
+            delay = max(delay, requested)
+        return delay
+
+    @staticmethod
+    async def fetch_data(url: str) -> dict:
+        session = await SteamAPI.get_session()
+        for attempt in range(SteamAPI.max_retries + 1):
+            await SteamAPI.rate_limiter.acquire()
+            status = None
+            retry_after = None
+            try:
+                with Metrics.span("steam_api"):
+                    async with session.get(url) as response:
+                        Metrics.increment(
+                            "steam_requests_total", status=response.status
+                        )
+                        if response.status == 200:
+                            return await response.json()
+                        status = response.status
+                        retry_after = response.headers.get("Retry-After")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as error:
+                reason = type(error).__name__
+            else:
+                reason = status
+
+            retryable = status is None or status == 429 or status >= 500
+            delay = SteamAPI.get_retry_delay(retry_after, attempt)
+            if not retryable or delay is None or attempt == SteamAPI.max_retries:
+                logger.warning(
+                    f"Error SteamAPI: {reason}",
+                    extra={"command": current_command.get(), "error": str(reason)}
+                )
+                return {}
+
+            if status == 429:
+                SteamAPI.rate_limiter.pause(delay)
+            await asyncio.sleep(delay)
+        return {}
+
+    @staticmethod
+    async def _fetch_players(steamids: list, semaphore: asyncio.Semaphore) -> list:
+        async with semaphore:
+            url = await SteamAPI.get_url(",".join(steamids))
+            data = await SteamAPI.fetch_data(url)
+            return data.get("response", {}).get("players", [])
+
+    @staticmethod
+    async def _request_profiles(steamids: list) -> dict:
+        """
+        GetPlayerSummaries accepts up to 100 ids per request,
+        so ids are chunked and chunks are requested concurrently.
+        """
+        chunk_size = SteamAPI.max_ids_per_request
+        chunks = [
+            steamids[index:index + chunk_size]
+            for index in range(0, len(steamids), chunk_size)
+        ]
+        semaphore = asyncio.Semaphore(SteamAPI.max_concurrent_requests)
+        results = await asyncio.gather(
+            *(SteamAPI._fetch_players(chunk, semaphore) for chunk in chunks)
+        )
+
+        profiles = {}
+        for players in results:
+            for player in players:
+                profiles[player.get("steamid")] = (
+                    player.get("personaname", "Unknown"),
+                    player.get("avatarfull", "Unknown")
+                )
+        return profiles
+
+    @staticmethod
+    async def get_profiles(steamids) -> dict:
+        """
+        Resolves many SteamIDs at once through the profile cache.
+        Returns {steamid: (name, avatar)}, unresolved ids
+        are mapped to (steamid, None).
+        """
+        profiles = await SteamAPI.cache.get_many(
+            steamids, SteamAPI._request_profiles
+        )
+        return {
+            steamid: profile or (steamid, None)
+            for steamid, profile in profiles.items()
+        }
+
+    @staticmethod
+    def cache_stats() -> dict:
+        return SteamAPI.cache.stats()
 
     @staticmethod
     async def get_profile_name_and_avatar(steamid: str) -> tuple:
-        url = await SteamAPI.get_url(steamid)
-        data = await SteamAPI.fetch_data(url)
-        players = data.get("response", {}).get("players", [])
-        if players:
-            return (
-                players[0].get("personaname", "Unknown"),
-                players[0].get("avatarfull", "Unknown")
-            )
-        return steamid, None
+        profiles = await SteamAPI.get_profiles([steamid])
+        return profiles[steamid]
 
     @staticmethod
     async def get_steam_profile_name(steamid: str) -> str:
-        url = await SteamAPI.get_url(steamid)
-        data = await SteamAPI.fetch_data(url)
-        player = data.get("response", {}).get("players", [])[0]
-        if player:
-            return player.get("personaname", "Unknown")
-        return steamid
+        profile_name, _ = await SteamAPI.get_profile_name_and_avatar(steamid)
+        return profile_name
 
     @staticmethod
     async def get_steam_profile_link(steamid: str) -> str:
@@ -0,0 +1,73 @@
+import asyncio
+import random
+
+import asyncssh
+
+from utils.config import config
+from utils.file_manager import FileManager
+from utils.log import logger
+
+sync_config = config.get("sync", {})
+
+
+class FileSync:
+    """
+    Optional background task that keeps the files of every server
+    mirrored locally. Each server is polled on its own jittered interval,
+    files are downloaded only when their remote stat changed, and the
+    parsed models are refreshed ahead of time, so read commands
+    are answered from the mirror without any network I/O.
+    """
+    files = ["ra_file", "whitelist_file", "reserved_slots_file"]
+
+    def __init__(self, servers, interval: float = 60, jitter: float = 0.2):
+        self.servers = list(servers)
+        self.interval = interval
+        self.jitter = jitter
+        self._tasks: list[asyncio.Task] = []
+
+    def staleness(self) -> float:
+        return (
+            self.interval * (1 + self.jitter)
+            + FileManager.connect_timeout + FileManager.read_timeout
+        )
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        FileManager.mirror_staleness = self.staleness()
+        self._tasks = [
+            asyncio.create_task(self._poll(server)) for server in self.servers
+        ]
+
+    async def stop(self) -> None:
+        FileManager.mirror_staleness = 0
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _poll(self, server) -> None:
+        # Spread the first polls, so servers are not hit all at once
+        await asyncio.sleep(random.uniform(0, self.interval))
+        while True:
+            await self.refresh(server)
+            await asyncio.sleep(
+                self.interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+            )
+
+    async def refresh(self, server) -> None:
+        try:
+            await FileManager.load_many(server, self.files)
+        except (asyncio.TimeoutError, asyncssh.Error, OSError) as error:
+            logger.warning(
+                f"Не вдалося синхронізувати {server}: {error!r}",
+                extra={"server": server, "error": repr(error)}
+            )
+
+
+file_sync = FileSync(
+    config["servers"],
+    interval=sync_config.get("interval", 60),
+    jitter=sync_config.get("jitter", 0.2)
+) if sync_config.get("enabled", False) else None
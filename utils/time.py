@@ -4,11 +4,19 @@ import pytz
 
 
 class Time:
+    # Created once, building a pytz timezone on every call is not free
+    timezone = pytz.timezone("Europe/Kiev")
+
     @staticmethod
     async def get_current() -> datetime:
-        return datetime.now(pytz.timezone("Europe/Kiev"))
+        return datetime.now(Time.timezone)
 
     @staticmethod
     async def get_normalised() -> str:
         time = await Time.get_current()
         return time.strftime("%H:%M:%S %d.%m.%Y")
+
+    @staticmethod
+    def from_timestamp(timestamp: float) -> str:
+        time = datetime.fromtimestamp(timestamp, Time.timezone)
+        return time.strftime("%H:%M:%S %d.%m.%Y")
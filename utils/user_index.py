@@ -0,0 +1,103 @@
+from utils.ra_config import RAConfig
+
+
+class UserIndex:
+    """
+    In-memory reverse index over the files of all servers:
+    steamid -> server -> {"role", "whitelist", "reserved_slots"}.
+    It is fed every freshly parsed or uploaded model. An uploaded model
+    only applies the changes() it tracked since the copy it was edited
+    from, a freshly parsed one is compared with what the index holds for
+    that file, so per-user and per-role queries never scan the files.
+    """
+    flags = {
+        "whitelist_file": "whitelist",
+        "reserved_slots_file": "reserved_slots",
+    }
+
+    def __init__(self):
+        self.users: dict[str, dict[str, dict]] = {}
+        self.by_role: dict[str, dict[str, set[str]]] = {}
+        # flag -> server -> steamids listed in that file
+        self.listed: dict[str, dict[str, set[str]]] = {
+            flag: {} for flag in self.flags.values()
+        }
+
+    def _state(self, steamid: str, server: str) -> dict:
+        return self.users.setdefault(steamid, {}).setdefault(
+            server, {"role": None, "whitelist": False, "reserved_slots": False}
+        )
+
+    def _drop_if_empty(self, steamid: str, server: str) -> None:
+        servers = self.users.get(steamid, {})
+        state = servers.get(server)
+        if state and not any(state.values()):
+            del servers[server]
+        if not servers:
+            self.users.pop(steamid, None)
+
+    def update(self, server: str, choose: str, model) -> None:
+        if model.original:
+            # An edited copy of a model that was already indexed
+            for steamid, _, value in model.changes():
+                self._set(server, choose, steamid, value)
+            return
+
+        if isinstance(model, RAConfig):
+            previous = {
+                steamid: role
+                for role, servers in self.by_role.items()
+                for steamid in servers.get(server, ())
+            }
+            current = model.members
+        else:
+            previous = dict.fromkeys(self.listed[self.flags[choose]].get(server, ()), True)
+            current = dict.fromkeys(model.entries, True)
+
+        for steamid in previous.keys() - current.keys():
+            self._set(server, choose, steamid, None)
+        for steamid, value in current.items():
+            if previous.get(steamid) != value:
+                self._set(server, choose, steamid, value)
+
+    def _set(self, server: str, choose: str, steamid: str, value) -> None:
+        state = self._state(steamid, server)
+        if choose == "ra_file":
+            old_role = state["role"]
+            if old_role:
+                self.by_role.get(old_role, {}).get(server, set()).discard(steamid)
+            if value:
+                self.by_role.setdefault(value, {}).setdefault(server, set()).add(steamid)
+            state["role"] = value
+        else:
+            flag = self.flags[choose]
+            listed = self.listed[flag].setdefault(server, set())
+            if value:
+                listed.add(steamid)
+            else:
+                listed.discard(steamid)
+            state[flag] = bool(value)
+        self._drop_if_empty(steamid, server)
+
+    def get(self, steamid: str) -> dict:
+        return self.users.get(steamid, {})
+
+    def with_role(self, role: str) -> dict[str, list[str]]:
+        return {
+            server: sorted(steamids)
+            for server, steamids in self.by_role.get(role, {}).items()
+            if steamids
+        }
+
+    def whitelisted_without_role(self) -> dict[str, list[str]]:
+        return {
+            server: without_role
+            for server, steamids in self.listed["whitelist"].items()
+            if (without_role := sorted(
+                steamid for steamid in steamids
+                if not self.users[steamid][server]["role"]
+            ))
+        }
+
+
+user_index = UserIndex()
@@ -0,0 +1,98 @@
+import copy
+import re
+
+ENTRY_PATTERN = re.compile(r"^\s*(\d+)@steam\b")
+
+
+class UserList:
+    """
+    Parsed UserIDWhitelist.txt / UserIDReservedSlots.txt.
+    SteamIDs are indexed in a dict for O(1) membership checks, comments
+    and ordering are kept, and add/remove only touch the affected lines:
+    removed lines are left as None and skipped by to_text().
+    """
+    def __init__(self, text: str):
+        self.lines: list[str | None] = text.splitlines(keepends=True)
+        self.newline = "\r\n" if text.count("\r\n") > text.count("\n") // 2 else "\n"
+        self.entries: dict[str, list[int]] = {}
+        self.modified = False
+        # {steamid: whether it was listed before the first change}, for changes()
+        self.original: dict[str, bool] = {}
+        for index, line in enumerate(self.lines):
+            match = ENTRY_PATTERN.match(line)
+            if match:
+                self.entries.setdefault(match.group(1), []).append(index)
+
+    def copy(self) -> "UserList":
+        """An independent copy to edit, without parsing the file again."""
+        clone = copy.copy(self)
+        clone.lines = list(self.lines)
+        clone.entries = {steamid: list(indexes) for steamid, indexes in self.entries.items()}
+        clone.original = {}
+        clone.modified = False
+        return clone
+
+    def __contains__(self, steamid: str) -> bool:
+        return steamid in self.entries
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def steamids(self) -> list[str]:
+        return list(self.entries)
+
+    def add(self, steamid: str) -> bool:
+        if steamid in self.entries:
+            return False
+        self.original.setdefault(steamid, False)
+        last = next(
+            (index for index in range(len(self.lines) - 1, -1, -1)
+             if self.lines[index] is not None),
+            None
+        )
+        if last is not None and not self.lines[last].endswith(("\n", "\r")):
+            self.lines[last] += self.newline
+        self.lines.append(f"{steamid}@steam{self.newline}")
+        self.entries[steamid] = [len(self.lines) - 1]
+        self.modified = True
+        return True
+
+    def remove(self, steamid: str) -> bool:
+        indexes = self.entries.pop(steamid, None)
+        if indexes is None:
+            return False
+        self.original.setdefault(steamid, True)
+        for index in indexes:
+            self.lines[index] = None
+        self.modified = True
+        return True
+
+    def changes(self) -> list[tuple]:
+        """[(steamid, was listed, is listed)] since parsing."""
+        return [
+            (steamid, listed, steamid in self.entries)
+            for steamid, listed in self.original.items()
+            if listed != (steamid in self.entries)
+        ]
+
+    def apply(self, changes: dict[str, bool]) -> list[str]:
+        """
+        Applies {steamid: whether it should be listed}
+        and returns the diff() of all changes so far.
+        """
+        for steamid, listed in changes.items():
+            if listed:
+                self.add(steamid)
+            else:
+                self.remove(steamid)
+        return self.diff()
+
+    def diff(self) -> list[str]:
+        """Changed entries as "+ <steamid>@steam" / "- <steamid>@steam"."""
+        return [
+            f"{'+' if listed else '-'} {steamid}@steam"
+            for steamid, _, listed in self.changes()
+        ]
+
+    def to_text(self) -> str:
+        return "".join(line for line in self.lines if line is not None)
@@ -0,0 +1,47 @@
+import asyncio
+import time
+
+import asyncssh
+
+from utils.file_manager import FileManager
+from utils.steam import SteamAPI
+from utils.sync import FileSync
+from utils.log import logger
+
+
+class WarmUp:
+    """
+    Runs once after start-up, so the first command is as fast as later ones:
+    opens the pooled SFTP connections, downloads and parses the files of
+    every server and resolves the Steam profiles of existing admins.
+    """
+    @staticmethod
+    async def load_server(server, semaphore) -> list[str]:
+        async with semaphore:
+            try:
+                ra_config, *_ = await FileManager.load_many(server, FileSync.files)
+            except (asyncio.TimeoutError, asyncssh.Error, OSError) as error:
+                logger.warning(
+                    f"Прогрів: сервер {server} недоступний ({error!r})",
+                    extra={"server": server, "error": repr(error)}
+                )
+                return []
+        logger.info(f"Прогрів: сервер {server} готовий", extra={"server": server})
+        return list(ra_config.members)
+
+    @staticmethod
+    async def run(servers) -> None:
+        started = time.monotonic()
+        semaphore = asyncio.Semaphore(FileManager.max_concurrent_servers)
+        results = await asyncio.gather(
+            *(WarmUp.load_server(server, semaphore) for server in servers)
+        )
+
+        steamids = {steamid for admins in results for steamid in admins}
+        await SteamAPI.get_profiles(steamids)
+        latency = time.monotonic() - started
+        logger.info(
+            f"Прогрів завершено за {latency:.1f} с: "
+            f"серверів {len(servers)}, профілів {len(steamids)}",
+            extra={"latency": latency}
+        )